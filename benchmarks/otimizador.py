@@ -0,0 +1,57 @@
+"""Mede o tempo do OtimizadorMarkowitz (três perfis e fronteira) em dados
+sintéticos com estrutura de fatores por segmento.
+
+Uso: python benchmarks/otimizador.py [ativos ...]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.Covariancia import EstimadorCovariancia
+from classes.Otimizador import OtimizadorMarkowitz
+
+OBSERVACOES = 1500
+SEGMENTOS = 8
+REPETICOES = 3
+
+
+def dados_sinteticos(n: int, semente: int = 0) -> tuple:
+    rng = np.random.default_rng(semente)
+    indices = rng.integers(0, SEGMENTOS, n)
+    fatores = rng.normal(0, 0.01, (OBSERVACOES, SEGMENTOS))
+    mercado = rng.normal(0.0003, 0.008, (OBSERVACOES, 1))
+    retornos = mercado + fatores[:, indices] + rng.normal(0.0002, 0.015, (OBSERVACOES, n))
+
+    tickers = [f"A{i:04d}" for i in range(n)]
+    datas = pd.bdate_range("2019-01-01", periods=OBSERVACOES)
+    retornos = pd.DataFrame(retornos, index=datas, columns=tickers)
+    segmentos = pd.Series([f"S{s}" for s in indices], index=tickers)
+    return retornos, segmentos
+
+
+def medir(funcao) -> float:
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos))
+
+
+if __name__ == "__main__":
+    tamanhos = [int(n) for n in sys.argv[1:]] or [30, 100, 300, 1000, 1500]
+    otimizador = OtimizadorMarkowitz()
+    estimador = EstimadorCovariancia("ledoit_wolf", usar_cache=False)
+
+    for n in tamanhos:
+        retornos, segmentos = dados_sinteticos(n)
+        retorno_medio = retornos.mean() * 252
+        cov = estimador.estimar(retornos)
+
+        perfis = medir(lambda: otimizador.otimizar_perfis(retorno_medio, cov, segmentos))
+        fronteira = medir(lambda: otimizador.fronteira(retorno_medio, cov, segmentos, pontos=50))
+        print(f"{n} ativos: perfis {perfis:.2f}s, fronteira (50 pontos) {fronteira:.2f}s")
@@ -0,0 +1,81 @@
+"""Compara a leitura das tabelas das páginas coletadas antes e depois da
+troca do BeautifulSoup por uma única passada do lxml.
+
+Uso: python benchmarks/processar_tabelas.py [pagina.html ...]
+
+Sem argumentos, usa as páginas em benchmarks/fixtures, que reproduzem a
+estrutura da página de ranking de ações do investidor10 e da listagem do
+etfsbrasil (cabeçalho, scripts, menus e a tabela com as colunas usadas
+na coleta). Páginas reais guardadas pelo cache podem ser passadas como
+argumento. As duas versões de __processar_tabelas estão copiadas aqui
+porque o ColetorDados depende do Selenium e do banco só para ser
+instanciado.
+"""
+import os
+import sys
+import time
+from io import StringIO
+import pandas as pd
+from bs4 import BeautifulSoup
+
+DIRETORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+REPETICOES = 20
+
+
+def processar_tabelas_antigo(html):
+    soup = BeautifulSoup(html, "html.parser")
+    tables = soup.find_all("table")
+
+    if not tables:
+        return pd.DataFrame()
+
+    df_total = pd.DataFrame()
+    for i, table in enumerate(tables):
+        try:
+            df = pd.read_html(StringIO(str(table)))[0]
+            df_total = pd.concat([df_total, df], ignore_index=True)
+        except Exception as e:
+            print(f"Erro ao processar tabela {i+1}: {e}")
+
+    return df_total
+
+
+def processar_tabelas_novo(html):
+    try:
+        tabelas = pd.read_html(StringIO(html), flavor="lxml")
+    except ValueError:
+        return pd.DataFrame()
+
+    if not tabelas:
+        return pd.DataFrame()
+
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def medir(funcao, html) -> float:
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        funcao(html)
+    return (time.perf_counter() - inicio) / REPETICOES
+
+
+if __name__ == "__main__":
+    caminhos = sys.argv[1:] or sorted(
+        os.path.join(DIRETORIO_FIXTURES, nome) for nome in os.listdir(DIRETORIO_FIXTURES)
+        if nome.endswith(".html")
+    )
+
+    for caminho in caminhos:
+        with open(caminho, "r", encoding="utf-8") as f:
+            html = f.read()
+
+        antigo = processar_tabelas_antigo(html)
+        novo = processar_tabelas_novo(html)
+        pd.testing.assert_frame_equal(antigo, novo)
+
+        tempo_antigo, tempo_novo = medir(processar_tabelas_antigo, html), medir(processar_tabelas_novo, html)
+        print(
+            f"{os.path.basename(caminho)}: {len(html) / 1024:.0f} KB, {len(novo)} linhas | "
+            f"antigo {tempo_antigo * 1000:.1f} ms, novo {tempo_novo * 1000:.1f} ms "
+            f"({tempo_antigo / tempo_novo:.1f}x)"
+        )
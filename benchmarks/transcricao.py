@@ -0,0 +1,76 @@
+"""Mede a transcrição dos MP3 em audios/ com o Transcritor em várias
+combinações de processos e threads, e compara com o modo antigo, que
+carregava o modelo Whisper a cada chamada.
+
+Uso: python benchmarks/transcricao.py [audio ...]
+
+Cada combinação transcreve os arquivos duas vezes com a mesma instância:
+a primeira rodada inclui a carga do modelo nos processos do pool e a
+segunda já encontra os modelos carregados, como acontece a partir do
+segundo vídeo de uma ingestão.
+"""
+import glob
+import os
+import sys
+import time
+import whisper
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.Transcritor import Transcritor
+from config import DIRETORIO_PROJETO, WHISPER_MODELO, WHISPER_SEGMENTO_S
+
+NUCLEOS = os.cpu_count() or 1
+# (processos, threads por processo)
+COMBINACOES = [(1, NUCLEOS), (2, max(1, NUCLEOS // 2)), (4, max(1, NUCLEOS // 4)), (NUCLEOS, 1)]
+
+
+def duracao(caminho: str) -> float:
+    return len(whisper.load_audio(caminho)) / whisper.audio.SAMPLE_RATE
+
+
+def modelo_por_chamada(caminhos: list) -> tuple:
+    # Como o Video.transcrever fazia antes do Transcritor: carrega o modelo,
+    # transcreve o arquivo inteiro e descarta o modelo
+    carga = total = 0.0
+    for caminho in caminhos:
+        inicio = time.perf_counter()
+        modelo = whisper.load_model(WHISPER_MODELO)
+        carregado = time.perf_counter()
+        modelo.transcribe(caminho, fp16=False)
+        carga += carregado - inicio
+        total += time.perf_counter() - inicio
+        del modelo
+    return carga, total
+
+
+def transcritor(caminhos: list, workers: int, threads: int) -> tuple:
+    servico = Transcritor(WHISPER_MODELO, workers, threads, WHISPER_SEGMENTO_S)
+    try:
+        rodadas = []
+        for _ in range(2):
+            inicio = time.perf_counter()
+            for caminho in caminhos:
+                servico.transcrever(caminho)
+            rodadas.append(time.perf_counter() - inicio)
+    finally:
+        servico.fechar()
+    return tuple(rodadas)
+
+
+if __name__ == "__main__":
+    caminhos = sys.argv[1:] or sorted(glob.glob(os.path.join(DIRETORIO_PROJETO, "audios", "*.mp3")))
+    audio = sum(duracao(c) for c in caminhos)
+    print(f"{len(caminhos)} arquivos, {audio / 60:.1f} min de áudio, modelo '{WHISPER_MODELO}', {NUCLEOS} núcleos")
+
+    carga, total = modelo_por_chamada(caminhos)
+    print(f"modelo por chamada: {total:.1f}s ({carga:.1f}s carregando o modelo), {audio / total:.1f}x tempo real")
+
+    for workers, threads in dict.fromkeys(COMBINACOES):
+        if workers > NUCLEOS:
+            continue
+        fria, quente = transcritor(caminhos, workers, threads)
+        print(
+            f"{workers} processos x {threads} threads: {fria:.1f}s com a carga do modelo, "
+            f"{quente:.1f}s com o modelo carregado ({audio / quente:.1f}x tempo real)"
+        )
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+from config import DIRETORIO_PRECOS
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+class ArmazemPrecos:
+    """Cópia local de PRECOS em formato de matriz (datas × tickers).
+
+    Cada versão do armazém é um diretório com a matriz em `matriz.npy`
+    (float64, NaN onde não há preço), as datas em `datas.npy` e os tickers
+    em `tickers.json`. O arquivo `atual` aponta para a versão em uso e é
+    trocado atomicamente depois que a nova versão está completa, então um
+    leitor nunca vê arquivos de versões diferentes misturados.
+
+    A matriz é aberta com memory-map e `selecionar` copia apenas o bloco
+    pedido (datas a partir de `desde` × tickers), sem ler o resto.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, diretorio: str = DIRETORIO_PRECOS):
+        self.__diretorio = diretorio
+        self.__caminho_atual = os.path.join(diretorio, "atual")
+
+    def __versao_atual(self) -> str:
+        try:
+            with open(self.__caminho_atual, "r", encoding="utf-8") as f:
+                versao = f.read().strip()
+        except FileNotFoundError:
+            return None
+
+        return os.path.join(self.__diretorio, versao) if versao else None
+
+    def existe(self) -> bool:
+        return self.__versao_atual() is not None
+
+    def __abrir(self) -> tuple:
+        versao = self.__versao_atual()
+        if versao is None:
+            return None
+
+        matriz = np.load(os.path.join(versao, "matriz.npy"), mmap_mode="r")
+        datas = pd.DatetimeIndex(np.load(os.path.join(versao, "datas.npy")), name="DATA")
+        with open(os.path.join(versao, "tickers.json"), "r", encoding="utf-8") as f:
+            tickers = pd.Index(json.load(f), name="TICKER")
+
+        return matriz, datas, tickers
+
+    def carregar(self) -> pd.DataFrame:
+        aberto = self.__abrir()
+        if aberto is None:
+            return None
+
+        matriz, datas, tickers = aberto
+        return pd.DataFrame(np.asarray(matriz), index=datas, columns=tickers, copy=False)
+
+    def selecionar(self, tickers: list, desde=None) -> pd.DataFrame:
+        """Preços dos `tickers` a partir de `desde`, apenas nas datas em que
+        algum deles tem preço (como no pivot de PRECOS). Tickers sem nenhum
+        preço ficam de fora. Retorna None se o armazém não existir."""
+        aberto = self.__abrir()
+        if aberto is None:
+            return None
+
+        matriz, datas, colunas = aberto
+        inicio = 0 if desde is None else datas.searchsorted(pd.Timestamp(desde))
+
+        presentes = [t for t in tickers if t in colunas]
+        bloco = np.asarray(matriz[inicio:, colunas.get_indexer(presentes)])
+        linhas = ~np.isnan(bloco).all(axis=1)
+
+        return pd.DataFrame(bloco[linhas], index=datas[inicio:][linhas],
+                            columns=pd.Index(presentes, name="TICKER"), copy=False)
+
+    def __gravar(self, df: pd.DataFrame):
+        os.makedirs(self.__diretorio, exist_ok=True)
+
+        numeros = [int(nome[1:]) for nome in os.listdir(self.__diretorio)
+                   if nome[:1] == "v" and nome[1:].isdigit()]
+        versao = os.path.join(self.__diretorio, f"v{max(numeros, default=0) + 1}")
+        os.makedirs(versao)
+
+        np.save(os.path.join(versao, "matriz.npy"), df.to_numpy(dtype=np.float64))
+        np.save(os.path.join(versao, "datas.npy"), df.index.values.astype("datetime64[D]"))
+        with open(os.path.join(versao, "tickers.json"), "w", encoding="utf-8") as f:
+            json.dump(list(df.columns), f)
+
+        temporario = self.__caminho_atual + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(os.path.basename(versao))
+        os.replace(temporario, self.__caminho_atual)
+
+        # Versões antigas (ou incompletas, de uma execução interrompida) são
+        # removidas; as que ainda estiverem abertas por algum leitor ficam
+        # para a próxima gravação. Os arquivos soltos são do formato antigo,
+        # sem versões
+        for nome in os.listdir(self.__diretorio):
+            caminho = os.path.join(self.__diretorio, nome)
+            if nome[:1] == "v" and nome[1:].isdigit() and caminho != versao:
+                shutil.rmtree(caminho, ignore_errors=True)
+            elif nome in ("matriz.npy", "datas.npy", "tickers.json"):
+                os.remove(caminho)
+
+    def atualizar(self, df_precos: pd.DataFrame):
+        """Incorpora preços no formato longo (DATA, TICKER, PRECO), como os
+        enviados para PRECOS no sincronizar. A coleta junta todos os lotes
+        de uma execução e chama este método uma única vez."""
+        if df_precos is None or df_precos.empty:
+            return
+
+        lote = df_precos[["DATA", "TICKER", "PRECO"]].copy()
+        lote["DATA"] = pd.to_datetime(lote["DATA"])
+        lote["PRECO"] = pd.to_numeric(lote["PRECO"], errors="coerce")
+        lote = lote.drop_duplicates(subset=["DATA", "TICKER"], keep="last")
+        lote = lote.pivot(index="DATA", columns="TICKER", values="PRECO")
+
+        with self._lock:
+            atual = self.carregar()
+            combinado = lote if atual is None else lote.combine_first(atual)
+
+            combinado = combinado.sort_index().sort_index(axis=1)
+            self.__gravar(combinado)
+
+        logging.info(f"💾 Armazém local de preços atualizado: {combinado.shape}")
+
+    def reconstruir(self, df_precos: pd.DataFrame):
+        """Recria o armazém inteiro a partir de PRECOS no formato longo."""
+        with self._lock:
+            if os.path.exists(self.__caminho_atual):
+                os.remove(self.__caminho_atual)
+
+        self.atualizar(df_precos)
@@ -0,0 +1,169 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+import pandas as pd
+from classes.Covariancia import EstimadorCovariancia
+from classes.Otimizador import Otimizador, OtimizadorMarkowitz, PERFIS
+from config import (COVARIANCIA_METODO, BACKTEST_WORKERS, BACKTEST_FREQUENCIAS,
+                    BACKTEST_JANELAS, BACKTEST_CUSTOS)
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+def _pesos_alvo(tarefa: tuple) -> dict:
+    # Executada nos processos do pool: estima os parâmetros com a janela de
+    # retornos disponível na data de rebalanceamento e otimiza os perfis.
+    # `periodos` é o número de observações por ano da série de retornos
+    retornos, grupos, otimizador, metodo, periodos = tarefa
+
+    # Ativos sem variação na janela ainda não eram negociados (preço
+    # preenchido para trás) e ficam de fora
+    retornos = retornos.loc[:, retornos.std() > 0]
+    if retornos.shape[1] < 2:
+        return {}
+
+    estimador = EstimadorCovariancia(metodo, periodos=periodos, usar_cache=False)
+    cov = estimador.estimar(retornos, grupos)
+    segmentos = None if grupos is None else grupos["SEGMENTO"]
+
+    return otimizador.otimizar_perfis(retornos.mean() * periodos, cov, segmentos)
+
+
+class Backtest:
+    """Backtest walk-forward das carteiras geradas por Carteira.
+
+    Em cada data de rebalanceamento os pesos de cada perfil são recalculados
+    só com a janela de retornos anterior à data. Os rebalanceamentos (o
+    passo caro) rodam em paralelo num pool de processos; a simulação de
+    todos os cenários (frequência × janela × custo × perfil) é feita de uma
+    vez sobre um cubo datas × ativos × cenários.
+    """
+
+    def __init__(self, precos: pd.DataFrame, grupos: pd.DataFrame = None,
+                 otimizador: Otimizador = None, metodo_covariancia: str = COVARIANCIA_METODO,
+                 workers: int = BACKTEST_WORKERS):
+        self.__precos = precos.sort_index()
+        self.__retornos = self.__precos.pct_change().iloc[1:].fillna(0.0)
+        self.__grupos = grupos
+        self.__otimizador = otimizador or OtimizadorMarkowitz()
+        self.__metodo = metodo_covariancia
+        self.__workers = workers
+
+        dias = np.median(np.diff(self.__retornos.index.values).astype("timedelta64[D]").astype(float))
+        self.__periodos_ano = 365.25 / max(dias, 1.0)
+
+    def __datas_rebalanceamento(self, frequencia: str, janela: int) -> list:
+        datas = self.__retornos.index
+        ultimas = datas.to_series().groupby(datas.to_period(frequencia[0])).max()
+        posicoes = datas.get_indexer(ultimas)
+        return [p for p in posicoes if p + 1 >= janela]
+
+    def __calcular_alvos(self, frequencias: list, janelas: list) -> dict:
+        tarefas = {}
+        for frequencia, janela in product(frequencias, janelas):
+            for posicao in self.__datas_rebalanceamento(frequencia, janela):
+                tarefas[(frequencia, janela, posicao)] = None
+
+        # Cada (janela, data) é otimizado uma única vez, mesmo que apareça em
+        # mais de uma frequência
+        unicas = sorted({(janela, posicao) for _, janela, posicao in tarefas})
+        periodos = max(1, int(round(self.__periodos_ano)))
+        argumentos = [
+            (self.__retornos.iloc[posicao + 1 - janela:posicao + 1], self.__grupos, self.__otimizador,
+             self.__metodo, periodos)
+            for janela, posicao in unicas
+        ]
+
+        logging.info(f"🔄️ Otimizando {len(argumentos)} rebalanceamentos com {self.__workers} processos")
+        with ProcessPoolExecutor(max_workers=self.__workers) as executor:
+            resultados = dict(zip(unicas, executor.map(_pesos_alvo, argumentos, chunksize=4)))
+
+        return {chave: resultados[(chave[1], chave[2])] for chave in tarefas}
+
+    def executar(self, frequencias: list = None, janelas: list = None, custos: list = None) -> dict:
+        """Retorna {perfil: DataFrame} com uma linha por configuração
+        (frequência, janela, custo) e as métricas de desempenho."""
+        frequencias = frequencias or BACKTEST_FREQUENCIAS
+        janelas = janelas or BACKTEST_JANELAS
+        custos = custos if custos is not None else BACKTEST_CUSTOS
+
+        alvos = self.__calcular_alvos(frequencias, janelas)
+        tickers = self.__retornos.columns
+        T, A = self.__retornos.shape
+
+        cenarios = list(product(PERFIS, frequencias, janelas, custos))
+        S = len(cenarios)
+
+        # Cubo de pesos-alvo (datas × ativos × cenários) e máscara de rebalanceamento
+        cubo_alvos = np.zeros((T, A, S))
+        rebalancear = np.zeros((T, S), dtype=bool)
+
+        for s, (perfil, frequencia, janela, _) in enumerate(cenarios):
+            for (f, j, posicao), pesos_perfis in alvos.items():
+                if f != frequencia or j != janela or perfil not in pesos_perfis:
+                    continue
+                pesos = pesos_perfis[perfil].reindex(tickers).fillna(0.0).to_numpy()
+                cubo_alvos[posicao, :, s] = pesos
+                rebalancear[posicao, s] = True
+
+        valores, giros = self.__simular(cubo_alvos, rebalancear, np.array([c[3] for c in cenarios]))
+
+        tabelas = {}
+        for s, (perfil, frequencia, janela, custo) in enumerate(cenarios):
+            linha = {"frequencia": frequencia, "janela": janela, "custo": custo}
+            linha.update(self.__metricas(valores[:, s], giros[:, s], rebalancear[:, s]))
+            tabelas.setdefault(perfil, []).append(linha)
+
+        return {perfil: pd.DataFrame(linhas) for perfil, linhas in tabelas.items()}
+
+    def __simular(self, cubo_alvos: np.ndarray, rebalancear: np.ndarray, custos: np.ndarray) -> tuple:
+        retornos = self.__retornos.to_numpy()
+        T, A, S = cubo_alvos.shape
+
+        pesos = np.zeros((A, S))
+        valor = np.ones(S)
+        valores = np.empty((T, S))
+        giros = np.zeros((T, S))
+
+        for t in range(T):
+            # Evolução dos pesos com os retornos do período (o restante fica em caixa)
+            retorno_carteira = retornos[t] @ pesos
+            pesos = pesos * (1 + retornos[t])[:, None] / (1 + retorno_carteira)
+            valor = valor * (1 + retorno_carteira)
+
+            mascara = rebalancear[t]
+            if mascara.any():
+                giro = np.abs(cubo_alvos[t] - pesos).sum(axis=0) * mascara
+                valor = valor * (1 - custos * giro)
+                pesos = np.where(mascara, cubo_alvos[t], pesos)
+                giros[t] = giro
+
+            valores[t] = valor
+
+        return valores, giros
+
+    def __metricas(self, valores: np.ndarray, giros: np.ndarray, rebalancear: np.ndarray) -> dict:
+        # Só conta a partir do primeiro rebalanceamento
+        inicio = int(np.argmax(rebalancear)) if rebalancear.any() else len(valores)
+        valores = valores[inicio:]
+
+        if len(valores) < 2:
+            return {"retorno_anual": np.nan, "volatilidade_anual": np.nan, "sharpe_ratio": np.nan,
+                    "max_drawdown": np.nan, "giro_medio": np.nan}
+
+        retornos = np.diff(valores) / valores[:-1]
+        anos = len(retornos) / self.__periodos_ano
+        retorno_anual = (valores[-1] / valores[0]) ** (1 / anos) - 1
+        volatilidade = retornos.std(ddof=1) * np.sqrt(self.__periodos_ano) if len(retornos) > 1 else np.nan
+        drawdown = 1 - valores / np.maximum.accumulate(valores)
+
+        return {
+            "retorno_anual": float(retorno_anual),
+            "volatilidade_anual": float(volatilidade),
+            "sharpe_ratio": float(retorno_anual / volatilidade) if volatilidade and volatilidade > 0 else 0.0,
+            "max_drawdown": float(drawdown.max()),
+            "giro_medio": float(giros[rebalancear].mean()) if rebalancear.any() else 0.0,
+        }
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from config import DIRETORIO_CACHE, CACHE_TTL, CACHE_TAMANHO_MAXIMO, CACHE_OFFLINE
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+class CacheIndisponivel(LookupError):
+    ...
+
+
+class CacheDisco:
+    """Cache local de respostas brutas, endereçado por conteúdo.
+
+    Cada requisição (fonte + chave) aponta para um objeto comprimido cujo
+    nome é o hash SHA-256 do conteúdo, então respostas iguais ocupam espaço
+    uma única vez. Entradas expiram pelo TTL da fonte e os objetos menos
+    usados recentemente são removidos quando o tamanho máximo é excedido.
+    No modo offline nada expira e uma entrada ausente gera CacheIndisponivel.
+
+    O tamanho ocupado é mantido como um total corrente por diretório (lido
+    do disco uma vez por processo), então as gravações não percorrem o
+    cache; a varredura só acontece quando o limite é ultrapassado.
+    """
+
+    _lock = threading.Lock()
+    # Bytes ocupados pelos objetos, por diretório de cache
+    _tamanhos = {}
+    # Depois de ultrapassar o limite, o cache é reduzido até esta fração
+    # dele, para que a varredura não se repita a cada gravação
+    _FRACAO_APOS_LIMPEZA = 0.9
+
+    def __init__(self, diretorio: str = DIRETORIO_CACHE, ttls: dict = None,
+                 tamanho_maximo: int = CACHE_TAMANHO_MAXIMO, offline: bool = CACHE_OFFLINE):
+        self.__diretorio = diretorio
+        self.__ttls = CACHE_TTL if ttls is None else ttls
+        self.__tamanho_maximo = tamanho_maximo
+        self.__offline = offline
+
+    @property
+    def offline(self) -> bool:
+        return self.__offline
+
+    @staticmethod
+    def chave(*partes) -> str:
+        texto = json.dumps(partes, default=str, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def __caminho_chave(self, fonte: str, chave: str) -> str:
+        return os.path.join(self.__diretorio, "chaves", fonte, chave + ".json")
+
+    def __caminho_objeto(self, hash_conteudo: str) -> str:
+        return os.path.join(self.__diretorio, "objetos", hash_conteudo[:2], hash_conteudo + ".z")
+
+    def __gravar(self, caminho: str, conteudo: bytes):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(temporario, "wb") as f:
+            f.write(conteudo)
+
+        os.replace(temporario, caminho)
+
+    def obter(self, fonte: str, chave: str):
+        try:
+            with open(self.__caminho_chave(fonte, chave), "r", encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        ttl = self.__ttls.get(fonte)
+        if not self.__offline and ttl is not None and time.time() - entrada["criado"] > ttl:
+            return None
+
+        caminho = self.__caminho_objeto(entrada["objeto"])
+        try:
+            with open(caminho, "rb") as f:
+                conteudo = zlib.decompress(f.read())
+        except (FileNotFoundError, zlib.error):
+            return None
+
+        # Atualiza o horário de acesso usado na remoção LRU
+        try:
+            os.utime(caminho)
+        except OSError:
+            ...
+
+        return conteudo
+
+    def salvar(self, fonte: str, chave: str, conteudo: bytes):
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+        caminho = self.__caminho_objeto(hash_conteudo)
+
+        novo = 0
+        if os.path.exists(caminho):
+            os.utime(caminho)
+        else:
+            comprimido = zlib.compress(conteudo, 6)
+            self.__gravar(caminho, comprimido)
+            novo = len(comprimido)
+
+        entrada = {"objeto": hash_conteudo, "criado": time.time()}
+        self.__gravar(self.__caminho_chave(fonte, chave), json.dumps(entrada).encode("utf-8"))
+
+        if self.__tamanho_maximo is None:
+            return
+
+        with self._lock:
+            if self.__diretorio not in self._tamanhos:
+                self._tamanhos[self.__diretorio] = sum(t for _, t, _ in self.__objetos())
+            else:
+                self._tamanhos[self.__diretorio] += novo
+            excedido = self._tamanhos[self.__diretorio] > self.__tamanho_maximo
+
+        if excedido:
+            self.limpar()
+
+    def buscar(self, fonte: str, chave: str, produzir) -> bytes:
+        """Retorna o conteúdo em cache ou chama `produzir()` e guarda o
+        resultado (bytes)."""
+        conteudo = self.obter(fonte, chave)
+        if conteudo is not None:
+            return conteudo
+
+        if self.__offline:
+            raise CacheIndisponivel(f"Entrada '{fonte}/{chave}' ausente no cache (modo offline)")
+
+        conteudo = produzir()
+        self.salvar(fonte, chave, conteudo)
+        return conteudo
+
+    def __objetos(self) -> list:
+        objetos = []
+        for raiz, _, arquivos in os.walk(os.path.join(self.__diretorio, "objetos")):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                objetos.append((info.st_mtime, info.st_size, caminho))
+        return objetos
+
+    def __remover_chaves_orfas(self) -> int:
+        # Chaves cujo objeto foi removido, ou já expiradas, não servem mais
+        removidas = 0
+        agora = time.time()
+
+        for raiz, _, arquivos in os.walk(os.path.join(self.__diretorio, "chaves")):
+            ttl = self.__ttls.get(os.path.basename(raiz))
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    with open(caminho, "r", encoding="utf-8") as f:
+                        entrada = json.load(f)
+                    orfa = not os.path.exists(self.__caminho_objeto(entrada["objeto"]))
+                    expirada = not self.__offline and ttl is not None and agora - entrada["criado"] > ttl
+                except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                    orfa, expirada = True, False
+
+                if orfa or expirada:
+                    try:
+                        os.remove(caminho)
+                        removidas += 1
+                    except FileNotFoundError:
+                        ...
+
+        return removidas
+
+    def limpar(self):
+        if self.__tamanho_maximo is None:
+            return
+
+        with self._lock:
+            objetos = self.__objetos()
+            total = sum(tamanho for _, tamanho, _ in objetos)
+
+            # Remove os objetos usados há mais tempo; as chaves que apontavam
+            # para eles são removidas em seguida
+            if total > self.__tamanho_maximo:
+                alvo = self.__tamanho_maximo * self._FRACAO_APOS_LIMPEZA
+                for _, tamanho, caminho in sorted(objetos):
+                    if total <= alvo:
+                        break
+                    try:
+                        os.remove(caminho)
+                        total -= tamanho
+                    except FileNotFoundError:
+                        ...
+
+                logging.info(f"🧹 Cache reduzido para {total / 1024 ** 2:.1f} MB")
+
+            self._tamanhos[self.__diretorio] = total
+            removidas = self.__remover_chaves_orfas()
+
+        if removidas:
+            logging.info(f"🧹 {removidas} chaves sem objeto ou expiradas removidas do cache")
@@ -1,13 +1,21 @@
 import json
+import os
+import re
+from datetime import datetime, timedelta
 import logging
 import unicodedata
-from difflib import get_close_matches
 import numpy as np
 import pandas as pd
-import requests
 from pypika import Query, Table
 from classes.PostgreSQL import PostgresSQL
-from config import DB_CONNECTION_STRING, RESUMO_GERAL
+from classes.Otimizador import Otimizador, OtimizadorMarkowitz
+from classes.Covariancia import EstimadorCovariancia
+from classes.Backtest import Backtest
+from classes.Cenarios import GeradorCenarios
+from classes.ArmazemPrecos import ArmazemPrecos
+from classes.ClienteLLM import ClienteLLM, ErroLLM
+from classes.IndiceVetorial import IndiceVetorial
+from config import DB_CONNECTION_STRING, RESUMO_GERAL, SEGMENTOS_TOP_K, DASHBOARD_JANELA_DIAS
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -15,8 +23,18 @@ logging.basicConfig(level=logging.INFO,
 
 
 class Carteira:
-    def __init__(self):
+    def __init__(self, otimizador: Otimizador = None, estimador: EstimadorCovariancia = None,
+                 llm: ClienteLLM = None):
         self.__postgre = PostgresSQL(DB_CONNECTION_STRING)
+        self.__llm = llm or ClienteLLM()
+        self.__indice_segmentos = IndiceVetorial(self.__llm)
+        self.__otimizador = otimizador or OtimizadorMarkowitz()
+        self.__estimador = estimador or EstimadorCovariancia()
+        self.__gerador_cenarios = GeradorCenarios()
+        self.__armazem = ArmazemPrecos()
+        self.__grupos = pd.DataFrame(columns=["SEGMENTO", "CATEGORIA"])
+        self.__segmentos = pd.Series(dtype=object)
+        self.__parametros = None
         self.__resumo_texto = self.__ler_resumo()
         self.__PROMPT_TEMPLATE = (
         "Você é um modelo de classificação SEMÂNTICA. Sua tarefa é identificar quais segmentos da lista oficial "
@@ -43,17 +61,53 @@ class Carteira:
 
     def __query_segmentos(self):
         ativos = Table("ATIVOS")
-        return Query.from_(ativos).select(ativos.SEGMENTO).distinct()
+        categorias = Table("CATEGORIAS")
+        return (
+            Query.from_(ativos)
+            .left_join(categorias)
+            .on(ativos.CATEGORIA == categorias.id)
+            .select(ativos.SEGMENTO, categorias.CATEGORIA)
+            .distinct()
+        )
 
-    def __buscar_segmentos_postgre(self) -> list:
+    def __buscar_segmentos_postgre(self) -> dict:
+        """Retorna {segmento: descrição}, com os nomes das categorias em que o
+        segmento aparece."""
         df = self.__postgre.query(self.__query_segmentos().get_sql())
 
         if df is None or df.empty:
             logging.error("❌ Nenhum segmento foi retornado do banco")
-            return []
+            return {}
+
+        df = df.dropna(subset=["SEGMENTO"])
+        categorias = df.groupby("SEGMENTO")["CATEGORIA"].agg(
+            lambda c: ", ".join(sorted(c.dropna().astype(str).unique()))
+        )
 
         logging.info("✅ Segmentos coletados do __postgre")
-        return df["SEGMENTO"].dropna().tolist()
+        return {
+            segmento: f"{segmento} ({categoria})" if categoria else segmento
+            for segmento, categoria in categorias.items()
+        }
+
+    def __segmentos_candidatos(self, segmentos: dict) -> list:
+        # Pré-seleciona os segmentos mais próximos do resumo por similaridade
+        # de embeddings, para que só eles entrem no prompt
+        if len(segmentos) <= SEGMENTOS_TOP_K:
+            return list(segmentos)
+
+        paragrafos = [p.strip() for p in re.split(r"\n\s*\n", self.__resumo_texto) if p.strip()]
+
+        try:
+            if not self.__indice_segmentos.indexado(list(segmentos), list(segmentos.values())):
+                self.__indice_segmentos.indexar(list(segmentos), list(segmentos.values()))
+            candidatos = self.__indice_segmentos.buscar(paragrafos, SEGMENTOS_TOP_K)
+        except ErroLLM as e:
+            logging.warning(f"⚠️ Busca vetorial indisponível ({e}), usando a lista completa")
+            return list(segmentos)
+
+        logging.info(f"🧭 {len(candidatos)} de {len(segmentos)} segmentos pré-selecionados")
+        return [nome for nome, _ in candidatos]
 
     def __normalizar(self,s: str) -> str:
         s = str(s).strip().lower()
@@ -64,7 +118,8 @@ class Carteira:
         )
 
     def __segmentos_relevantes_llm(self) -> list:
-        segmentos___postgre = self.__buscar_segmentos_postgre()
+        descricoes = self.__buscar_segmentos_postgre()
+        segmentos___postgre = list(descricoes)
 
         if not segmentos___postgre or not self.__resumo_texto:
             return []
@@ -76,37 +131,25 @@ class Carteira:
             "SELIC", "CDI", "IPCA"  
         }
 
+        candidatos = self.__segmentos_candidatos(descricoes)
+
         mapa_normalizado = {
-            self.__normalizar(s): s for s in segmentos___postgre
+            self.__normalizar(s): s for s in candidatos
         }
-        segmentos_norm = list(mapa_normalizado.keys())
 
         prompt = self.__PROMPT_TEMPLATE.format(
-            lista_segmentos="\n".join(sorted(set(segmentos___postgre))),
+            lista_segmentos="\n".join(sorted(candidatos)),
             conteudo_resumo=self.__resumo_texto
         )
 
         logging.info("🔄 Consultando LLM para segmentação...")
 
         try:
-            resp = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "llama3.2:latest",
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {"temperature": 0.0},
-                }
-            )
-        except requests.exceptions.RequestException as e:
-            logging.error(f"❌ Erro de conexão com o Ollama: {e}")
+            resposta = self.__llm.gerar(prompt, options={"temperature": 0.0})
+        except ErroLLM as e:
+            logging.error(f"❌ {e}")
             return []
 
-        if resp.status_code != 200:
-            logging.error(f"❌ Falha API LLM: {resp.status_code}")
-            return []
-
-        resposta = resp.json().get("response", "")
         resposta = resposta.replace("\n", ";").replace("*", "").replace(".", "")
 
         # Tokeniza resposta
@@ -119,14 +162,11 @@ class Carteira:
             if len(seg) > 50:
                 continue
 
-            seg_norm = self.__normalizar(seg)
-            match = get_close_matches(seg_norm, segmentos_norm, n=1, cutoff=0.9)
+            oficial = mapa_normalizado.get(self.__normalizar(seg.strip(" -\"'`")))
 
-            if match:
-                oficial = mapa_normalizado[match[0]]
-                if oficial not in segmentos_finais:
-                    segmentos_finais.append(oficial)
-                    logging.info(f"👍 Segmento válido pela LLM: {oficial}")
+            if oficial and oficial not in segmentos_finais:
+                segmentos_finais.append(oficial)
+                logging.info(f"👍 Segmento válido pela LLM: {oficial}")
 
         for seg in SEGMENTOS_RF:
             if seg in segmentos___postgre and seg not in segmentos_finais:
@@ -146,7 +186,7 @@ class Carteira:
         ativos_tb = Table("ATIVOS")
         query = (
             Query.from_(ativos_tb)
-            .select(ativos_tb.TICKER)
+            .select(ativos_tb.TICKER, ativos_tb.SEGMENTO, ativos_tb.CATEGORIA)
             .where(ativos_tb.SEGMENTO.isin(segmentos))
             .distinct()
         )
@@ -161,13 +201,17 @@ class Carteira:
             logging.warning("⚠️ Poucos ativos — expandindo seleção...")
             extra_query = (
                 Query.from_(ativos_tb)
-                .select(ativos_tb.TICKER)
+                .select(ativos_tb.TICKER, ativos_tb.SEGMENTO, ativos_tb.CATEGORIA)
                 .limit(30)
             )
             extra = self.__postgre.query(extra_query.get_sql())
             if extra is not None:
                 df = pd.concat([df, extra]).drop_duplicates()
 
+        df = df.drop_duplicates(subset="TICKER")
+        self.__grupos = df.set_index("TICKER")[["SEGMENTO", "CATEGORIA"]]
+        self.__segmentos = self.__grupos["SEGMENTO"]
+
         logging.info(f"🔎 Total de ativos usados: {len(df)}")
         return df["TICKER"].tolist()
 
@@ -178,6 +222,20 @@ class Carteira:
         if not tickers:
             return pd.DataFrame()
 
+        # Usa a matriz local de preços quando disponível; senão consulta PRECOS
+        df = self.__armazem.selecionar(tickers)
+
+        if df is None:
+            df = self.__historico_precos_postgre(tickers)
+            if df.empty:
+                return df
+
+        df = df.ffill().bfill().dropna(axis=1, how="all")
+
+        logging.info(f"📈 Histórico carregado: {df.shape}")
+        return df
+
+    def __historico_precos_postgre(self, tickers: list) -> pd.DataFrame:
         precos_tb = Table("PRECOS")
         query = (
             Query.from_(precos_tb)
@@ -193,11 +251,7 @@ class Carteira:
         df["DATA"] = pd.to_datetime(df["DATA"])
         df = df.drop_duplicates(subset=["DATA", "TICKER"])
 
-        df = df.pivot(index="DATA", columns="TICKER", values="PRECO")
-        df = df.ffill().bfill().dropna(axis=1, how="all")
-
-        logging.info(f"📈 Histórico carregado: {df.shape}")
-        return df
+        return df.pivot(index="DATA", columns="TICKER", values="PRECO")
 
     def __limpar_pesos(self, carteiras: dict) -> dict:
         carteiras_filtradas = {}
@@ -219,73 +273,40 @@ class Carteira:
         return carteiras_filtradas
 
 
+    def __estimar_parametros(self) -> tuple:
+        # Histórico, retorno médio e covariância são calculados uma vez e
+        # compartilhados entre as carteiras e a fronteira eficiente
+        if self.__parametros is None:
+            df = self.__obter_historico_precos()
+
+            if df.empty:
+                return df, None, None
+
+            retornos = df.pct_change().dropna()
+            cov = self.__estimador.estimar(retornos, self.__grupos)
+            self.__parametros = (df, retornos.mean() * 252, cov)
+
+        return self.__parametros
+
     def calcular_carteiras(self):
-        df = self.__obter_historico_precos()
+        df, retorno_medio, cov = self.__estimar_parametros()
 
         if df.empty:
             logging.error("❌ Sem dados suficientes para calcular carteiras")
             return {}
 
-        retornos = df.pct_change().dropna()
-        retorno_medio = retornos.mean() * 252
-        volatilidade = retornos.std() * np.sqrt(252)
-        cov = retornos.cov() * 252
-        
-        ativos_ordenados = volatilidade.sort_values().index.tolist()
-        grupos_split = np.array_split(ativos_ordenados, 3)
-
-        safe = grupos_split[0].tolist()
-        medio = grupos_split[1].tolist()
-        risco = grupos_split[2].tolist()
-
-        logging.info(f"Grupos de risco: Safe({len(safe)}), Medio({len(medio)}), Risco({len(risco)})")
-
-        vol_min = float(volatilidade.min())
-        vol_max = float(volatilidade.max())
-        dispersao = (vol_max - vol_min) / max(vol_max, 1e-9)
-        dispersao = max(0.2, min(dispersao, 0.8))
-
-        pesos_perfil = {
-            "conservador": [
-                max(0, 0.50 + dispersao * 0.4),
-                max(0, 0.35 - dispersao * 0.2),
-                max(0, 0.15 - dispersao * 0.2),
-            ],
-            "moderado": [0.33, 0.34, 0.33],
-            "arrojado": [
-                max(0, 0.20 - dispersao * 0.1),
-                max(0, 0.30 - dispersao * 0.2),
-                max(0, 0.50 + dispersao * 0.3),
-            ],
-        }
-
-        for perfil in pesos_perfil:
-            total = sum(pesos_perfil[perfil])
-            pesos_perfil[perfil] = [p / total for p in pesos_perfil[perfil]]
-
-        grupos = [safe, medio, risco]
+        pesos_perfis = self.__otimizador.otimizar_perfis(retorno_medio, cov, self.__segmentos)
         carteiras = {}
 
-        for perfil, pesos in pesos_perfil.items():
-            carteira = {}
-
-            for grupo, peso_grupo in zip(grupos, pesos):
-                if not grupo:
-                    continue
+        for perfil, pesos in pesos_perfis.items():
+            w = pesos.reindex(cov.columns).fillna(0).to_numpy()
 
-                peso_individual = peso_grupo / len(grupo)
-
-                for ativo in grupo:
-                    carteira[ativo] = peso_individual
-
-            w = np.array([carteira.get(col, 0) for col in df.columns])
-
-            retorno_port = float(np.sum(w * retorno_medio))
-            vol_port = float(np.sqrt(w.T @ cov.values @ w))
+            retorno_port = float(np.sum(w * retorno_medio.reindex(cov.columns)))
+            vol_port = float(np.sqrt(EstimadorCovariancia.variancia(cov, w)))
             sharpe = retorno_port / vol_port if vol_port > 0 else 0
 
             carteiras[perfil] = {
-                "pesos": {t: float(p) for t, p in carteira.items()},
+                "pesos": {t: float(p) for t, p in pesos.items()},
                 "performance": {
                     "retorno_esperado": retorno_port,
                     "volatilidade_anual": vol_port,
@@ -293,8 +314,120 @@ class Carteira:
                 },
             }
 
+        # Métricas de risco por simulação de Monte Carlo (VaR, CVaR, drawdown)
+        cenarios = self.__gerador_cenarios.simular(
+            pesos_perfis, retorno_medio, cov, df.pct_change().dropna()
+        )
+        for perfil, metricas in cenarios.items():
+            carteiras[perfil]["performance"].update(metricas)
+
         carteiras_limpa = self.__limpar_pesos(carteiras)
 
+        # O JSON é gravado por último: se o pacote falhar, o dashboard não
+        # fica com carteiras novas e pacote antigo (ou incompleto)
+        self.__gerar_pacote_dashboard(carteiras_limpa)
+
         with open("carteiras_otimizadas.json", "w", encoding="utf-8") as f:
             json.dump(carteiras_limpa, f, ensure_ascii=False, indent=4)
 
+        return carteiras_limpa
+
+    def __metadados_ativos(self, tickers: list) -> pd.DataFrame:
+        ativos_tb = Table("ATIVOS")
+        categorias_tb = Table("CATEGORIAS")
+        query = (
+            Query.from_(ativos_tb)
+            .left_join(categorias_tb)
+            .on(ativos_tb.CATEGORIA == categorias_tb.id)
+            .select(ativos_tb.TICKER, ativos_tb.SEGMENTO, categorias_tb.CATEGORIA)
+            .where(ativos_tb.TICKER.isin(tickers))
+        )
+
+        df = self.__postgre.query(query.get_sql())
+        if df is None:
+            df = pd.DataFrame(columns=["TICKER", "SEGMENTO", "CATEGORIA"])
+
+        df = df.drop_duplicates(subset="TICKER").set_index("TICKER").reindex(tickers)
+        df["SEGMENTO"] = df["SEGMENTO"].fillna("Não Classificado")
+        df["CATEGORIA"] = df["CATEGORIA"].fillna("Não Categorizado")
+        return df.rename_axis("TICKER").reset_index()[["TICKER", "SEGMENTO", "CATEGORIA"]]
+
+    def __gerar_pacote_dashboard(self, carteiras: dict, diretorio: str = "dados_dashboard"):
+        """Grava, ao lado do JSON, tudo o que o dashboard exibe já calculado:
+        metadados dos ativos, matriz de preços da janela do dashboard, séries
+        base 100 e retornos mensais de cada perfil."""
+        tickers = sorted({t for dados in carteiras.values() for t in dados["pesos"]})
+        if not tickers:
+            return
+
+        desde = datetime.now() - timedelta(days=DASHBOARD_JANELA_DIAS)
+        precos = self.__armazem.selecionar(tickers, desde=desde)
+        if precos is None:
+            precos = self.__historico_precos_postgre(tickers)
+            precos = precos[precos.index >= desde] if not precos.empty else precos
+        precos = precos.ffill().dropna(axis=1, how="all")
+
+        series = {}
+        for perfil, dados in carteiras.items():
+            pesos = pd.Series(dados["pesos"]).reindex(precos.columns).fillna(0)
+            retorno = (precos.pct_change() * pesos).sum(axis=1)
+            if not retorno.empty:
+                serie = (1 + retorno).cumprod()
+                series[perfil] = serie / serie.iloc[0] * 100
+
+        # Sem preços na janela, `precos` não tem datas e as séries ficam
+        # vazias; o índice continua sendo de datas para o resample
+        backtest = pd.DataFrame(series, index=pd.DatetimeIndex(precos.index, name="DATA"))
+        mensal = backtest.resample("ME").last().pct_change().dropna(how="all") * 100
+        ativos = self.__metadados_ativos(tickers)
+
+        os.makedirs(diretorio, exist_ok=True)
+        ativos.to_parquet(os.path.join(diretorio, "ativos.parquet"), index=False)
+        precos.astype("float32").rename_axis("DATA").to_parquet(
+            os.path.join(diretorio, "precos.parquet"), compression="zstd"
+        )
+        backtest.to_parquet(os.path.join(diretorio, "backtest.parquet"))
+        mensal.to_parquet(os.path.join(diretorio, "mensal.parquet"))
+
+        logging.info(f"✅ Pacote do dashboard salvo em {diretorio}: {precos.shape[1]} ativos, {len(precos)} datas")
+
+    def calcular_fronteira(self, pontos: int = 50) -> pd.DataFrame:
+        if not self.__otimizador.calcula_fronteira:
+            logging.info(f"❕ {type(self.__otimizador).__name__} não calcula fronteira eficiente, etapa ignorada")
+            return pd.DataFrame()
+
+        df, retorno_medio, cov = self.__estimar_parametros()
+
+        if df.empty:
+            logging.error("❌ Sem dados suficientes para calcular a fronteira eficiente")
+            return pd.DataFrame()
+
+        fronteira = self.__otimizador.fronteira(retorno_medio, cov, self.__segmentos, pontos)
+
+        # Formato colunar compacto: pesos em float32 e só ativos usados em
+        # algum ponto da fronteira
+        colunas_metricas = ["retorno", "volatilidade", "sharpe"]
+        pesos = fronteira.drop(columns=colunas_metricas)
+        pesos = pesos.loc[:, (pesos > 0).any()].astype("float32")
+        fronteira = pd.concat([fronteira[colunas_metricas], pesos], axis=1)
+
+        fronteira.to_parquet("fronteira_eficiente.parquet", index=False, compression="zstd")
+        logging.info(f"✅ Fronteira eficiente com {len(fronteira)} pontos salva")
+        return fronteira
+
+    def calcular_backtest(self) -> dict:
+        df, _, _ = self.__estimar_parametros()
+
+        if df.empty:
+            logging.error("❌ Sem dados suficientes para o backtest")
+            return {}
+
+        tabelas = Backtest(df, self.__grupos, self.__otimizador).executar()
+
+        for perfil, tabela in tabelas.items():
+            logging.info(f"📊 Backtest {perfil}:\n{tabela.to_string(index=False)}")
+
+        pd.concat(tabelas, names=["perfil"]).reset_index(level=0).to_parquet(
+            "backtest_carteiras.parquet", index=False
+        )
+        return tabelas
@@ -0,0 +1,134 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from classes.Covariancia import ModeloFatorial
+from config import (CENARIOS_METODO, CENARIOS_SIMULACOES, CENARIOS_LOTE, CENARIOS_SEMENTE,
+                    CENARIOS_NIVEL, CENARIOS_WORKERS)
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+def _simular_lote(tarefa: tuple) -> tuple:
+    # Executada nos processos do pool. Cada lote tem sua própria semente,
+    # então o resultado não depende do número de processos
+    semente, tamanho, passos, metodo, parametros = tarefa
+    rng = np.random.default_rng(semente)
+
+    if metodo == "bootstrap":
+        historico = parametros
+        indices = rng.integers(0, historico.shape[0], size=(tamanho, passos))
+        retornos = historico[indices]
+    else:
+        media, fator = parametros
+        ruido = rng.standard_normal((tamanho, passos, len(media)))
+        retornos = media + ruido @ fator.T
+
+    valores = np.cumprod(1 + retornos, axis=1)
+    drawdowns = 1 - valores / np.maximum.accumulate(np.maximum(valores, 1.0), axis=1)
+
+    return valores[:, -1, :] - 1, drawdowns.max(axis=1)
+
+
+class GeradorCenarios:
+    """Simulação de Monte Carlo do valor das carteiras em um horizonte de
+    um ano.
+
+    - cholesky: retornos gaussianos, na frequência do histórico, com a
+      média e a covariância estimadas (correlacionados pela decomposição
+      de Cholesky);
+    - bootstrap: reamostragem dos retornos históricos observados.
+
+    Como só interessam os retornos das carteiras, a simulação é feita
+    diretamente no espaço dos perfis (Wᵀ Σ W), o que é exato para os dois
+    métodos. As trajetórias são geradas em lotes em um pool de processos e
+    descartadas depois de resumidas, mantendo a memória limitada.
+    """
+
+    def __init__(self, metodo: str = CENARIOS_METODO, simulacoes: int = CENARIOS_SIMULACOES,
+                 tamanho_lote: int = CENARIOS_LOTE, semente: int = CENARIOS_SEMENTE,
+                 nivel: float = CENARIOS_NIVEL, workers: int = CENARIOS_WORKERS,
+                 periodos_anualizacao: int = 252):
+        if metodo not in ("cholesky", "bootstrap"):
+            raise ValueError(f"Método de cenários desconhecido: {metodo}")
+
+        self.__metodo = metodo
+        self.__simulacoes = simulacoes
+        self.__tamanho_lote = tamanho_lote
+        self.__semente = semente
+        self.__nivel = nivel
+        self.__workers = workers
+        # Fator com que o retorno médio e a covariância recebidos foram
+        # anualizados (o mesmo do EstimadorCovariancia)
+        self.__periodos_anualizacao = periodos_anualizacao
+
+    @staticmethod
+    def __periodos_ano(retornos: pd.DataFrame) -> int:
+        # Observações por ano, pelo espaçamento mediano das datas (12 para
+        # dados mensais, ~252 para diários)
+        if retornos is None or len(retornos) < 2:
+            return 252
+        dias = np.median(np.diff(retornos.index.values).astype("timedelta64[D]").astype(float))
+        return max(1, int(round(365.25 / max(dias, 1.0))))
+
+    def __parametros(self, pesos: np.ndarray, retorno_medio: pd.Series, cov, retornos: pd.DataFrame) -> tuple:
+        # Um ano de trajetória tem um passo por observação do histórico
+        passos = self.__periodos_ano(retornos)
+
+        if self.__metodo == "bootstrap":
+            return passos, retornos.to_numpy() @ pesos
+
+        if isinstance(cov, ModeloFatorial):
+            exposicao = pesos.T @ cov.cargas
+            cov_perfis = exposicao @ cov.cov_fatores @ exposicao.T + pesos.T @ (cov.especifica[:, None] * pesos)
+        else:
+            cov_perfis = pesos.T @ np.asarray(cov) @ pesos
+
+        # Volta à escala de uma observação do histórico para cada passo
+        escala = self.__periodos_anualizacao
+        cov_perfis = cov_perfis / escala + 1e-12 * np.eye(len(cov_perfis))
+        media = pesos.T @ retorno_medio.to_numpy() / escala
+        return passos, (media, np.linalg.cholesky(cov_perfis))
+
+    def simular(self, carteiras: dict, retorno_medio: pd.Series, cov,
+                retornos: pd.DataFrame = None) -> dict:
+        """`carteiras` é {perfil: pd.Series de pesos}. Retorna {perfil: métricas}."""
+        perfis = list(carteiras)
+        tickers = list(cov.columns)
+        pesos = np.column_stack([carteiras[p].reindex(tickers).fillna(0.0).to_numpy() for p in perfis])
+
+        if self.__metodo == "bootstrap":
+            retornos = retornos[tickers]
+
+        passos, parametros = self.__parametros(pesos, retorno_medio.reindex(tickers), cov, retornos)
+
+        tamanhos = [self.__tamanho_lote] * (self.__simulacoes // self.__tamanho_lote)
+        if self.__simulacoes % self.__tamanho_lote:
+            tamanhos.append(self.__simulacoes % self.__tamanho_lote)
+        sementes = np.random.SeedSequence(self.__semente).spawn(len(tamanhos))
+
+        tarefas = [(s, t, passos, self.__metodo, parametros) for s, t in zip(sementes, tamanhos)]
+
+        logging.info(f"🔄️ Simulando {self.__simulacoes} cenários ({self.__metodo}) em {len(tarefas)} lotes")
+        with ProcessPoolExecutor(max_workers=self.__workers) as executor:
+            resultados = list(executor.map(_simular_lote, tarefas))
+
+        finais = np.concatenate([r[0] for r in resultados])
+        drawdowns = np.concatenate([r[1] for r in resultados])
+
+        return {perfil: self.__metricas(finais[:, i], drawdowns[:, i]) for i, perfil in enumerate(perfis)}
+
+    def __metricas(self, finais: np.ndarray, drawdowns: np.ndarray) -> dict:
+        percentil = (1 - self.__nivel) * 100
+        corte = np.percentile(finais, percentil)
+        rotulo = int(round(self.__nivel * 100))
+
+        return {
+            f"var_{rotulo}": float(-corte),
+            f"cvar_{rotulo}": float(-finais[finais <= corte].mean()),
+            "retorno_mediano_cenarios": float(np.median(finais)),
+            "drawdown_medio": float(drawdowns.mean()),
+            f"drawdown_p{rotulo}": float(np.percentile(drawdowns, self.__nivel * 100)),
+        }
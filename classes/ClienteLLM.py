@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from classes.CacheDisco import CacheDisco, CacheIndisponivel
+from config import (OLLAMA_URL, OLLAMA_MODELO, OLLAMA_TIMEOUT, OLLAMA_CONCORRENCIA,
+                    OLLAMA_TENTATIVAS, OLLAMA_BACKOFF, OLLAMA_MODELO_EMBEDDING)
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+class ErroLLM(RuntimeError):
+    ...
+
+
+class ClienteLLM:
+    """Cliente compartilhado para a API do Ollama.
+
+    Usa uma sessão HTTP com keep-alive, consome a resposta em streaming,
+    aplica timeout e novas tentativas com backoff exponencial e limita o
+    número de chamadas simultâneas. Latência e contagem de tokens de cada
+    chamada ficam em `metricas`.
+
+    As respostas ficam em cache no disco (fonte "llm"), indexadas pelo
+    modelo, hash do prompt, system e options, então entradas iguais não
+    voltam a ser enviadas ao modelo. Embeddings são guardados por texto
+    (fonte "embeddings") e só os textos novos são enviados.
+    """
+
+    def __init__(self, url: str = OLLAMA_URL, modelo: str = OLLAMA_MODELO,
+                 timeout: float = OLLAMA_TIMEOUT, concorrencia: int = OLLAMA_CONCORRENCIA,
+                 tentativas: int = OLLAMA_TENTATIVAS, backoff: float = OLLAMA_BACKOFF,
+                 cache: CacheDisco = None, usar_cache: bool = True,
+                 modelo_embedding: str = OLLAMA_MODELO_EMBEDDING):
+        self.__url = url.rstrip("/")
+        self.__modelo = modelo
+        self.__modelo_embedding = modelo_embedding
+        self.__timeout = timeout
+        self.__concorrencia = max(1, concorrencia)
+        self.__tentativas = max(1, tentativas)
+        self.__backoff = backoff
+        self.__cache = (cache or CacheDisco()) if usar_cache else None
+        self.__semaforo = threading.BoundedSemaphore(self.__concorrencia)
+        self.__sessao = requests.Session()
+        self.__sessao.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=self.__concorrencia))
+        self.__lock = threading.Lock()
+        self.metricas = []
+
+    @property
+    def modelo(self) -> str:
+        return self.__modelo
+
+    def __registrar(self, latencia: float, final: dict):
+        metrica = {
+            "modelo": final.get("model", self.__modelo),
+            "latencia_s": latencia,
+            "tokens_prompt": final.get("prompt_eval_count", 0),
+            "tokens_resposta": final.get("eval_count", 0),
+        }
+
+        with self.__lock:
+            self.metricas.append(metrica)
+
+        logging.info(
+            f"🦙 LLM: {latencia:.1f}s, {metrica['tokens_prompt']} tokens de prompt, "
+            f"{metrica['tokens_resposta']} tokens de resposta"
+        )
+
+    def __chamar(self, corpo: dict) -> str:
+        inicio = time.perf_counter()
+        partes = []
+        final = {}
+
+        with self.__sessao.post(f"{self.__url}/api/generate", json=corpo,
+                                stream=True, timeout=self.__timeout) as resposta:
+            if resposta.status_code != 200:
+                raise ErroLLM(f"Falha API LLM: {resposta.status_code} {resposta.text[:200]}")
+
+            for linha in resposta.iter_lines():
+                if not linha:
+                    continue
+
+                pedaco = json.loads(linha)
+                if "error" in pedaco:
+                    raise ErroLLM(pedaco["error"])
+
+                partes.append(pedaco.get("response", ""))
+                if pedaco.get("done"):
+                    final = pedaco
+                    break
+
+        self.__registrar(time.perf_counter() - inicio, final)
+        return "".join(partes)
+
+    def __chamar_embedding(self, corpo: dict) -> np.ndarray:
+        inicio = time.perf_counter()
+
+        resposta = self.__sessao.post(f"{self.__url}/api/embed", json=corpo, timeout=self.__timeout)
+        if resposta.status_code != 200:
+            raise ErroLLM(f"Falha API LLM: {resposta.status_code} {resposta.text[:200]}")
+
+        dados = resposta.json()
+        self.__registrar(time.perf_counter() - inicio, dados)
+        return np.asarray(dados["embeddings"], dtype=np.float32)
+
+    def embeddings(self, textos: list, tamanho_lote: int = 64) -> np.ndarray:
+        """Matriz (textos × dimensão) de embeddings em float32."""
+        chaves = [
+            CacheDisco.chave(self.__modelo_embedding, hashlib.sha256(t.encode("utf-8")).hexdigest())
+            for t in textos
+        ]
+        vetores = [None] * len(textos)
+
+        if self.__cache is not None:
+            for i, chave in enumerate(chaves):
+                conteudo = self.__cache.obter("embeddings", chave)
+                if conteudo is not None:
+                    vetores[i] = np.frombuffer(conteudo, dtype=np.float32)
+
+        faltando = [i for i, v in enumerate(vetores) if v is None]
+        if faltando and self.__cache is not None and self.__cache.offline:
+            raise ErroLLM(f"{len(faltando)} embeddings ausentes no cache (modo offline)")
+
+        for inicio in range(0, len(faltando), tamanho_lote):
+            lote = faltando[inicio:inicio + tamanho_lote]
+            corpo = {"model": self.__modelo_embedding, "input": [textos[i] for i in lote]}
+            resultado = self.__com_tentativas(self.__chamar_embedding, corpo)
+
+            for i, vetor in zip(lote, resultado):
+                vetores[i] = vetor
+                if self.__cache is not None:
+                    self.__cache.salvar("embeddings", chaves[i], vetor.tobytes())
+
+        if not vetores:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vetores)
+
+    def gerar(self, prompt: str, system: str = None, options: dict = None) -> str:
+        corpo = {"model": self.__modelo, "prompt": prompt, "stream": True}
+        if system is not None:
+            corpo["system"] = system
+        if options is not None:
+            corpo["options"] = options
+
+        if self.__cache is None:
+            return self.__com_tentativas(self.__chamar, corpo)
+
+        chave = CacheDisco.chave(
+            self.__modelo, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), system, options
+        )
+
+        try:
+            return self.__cache.buscar(
+                "llm", chave, lambda: self.__com_tentativas(self.__chamar, corpo).encode("utf-8")
+            ).decode("utf-8")
+        except CacheIndisponivel as e:
+            raise ErroLLM(str(e)) from e
+
+    def __com_tentativas(self, chamada, corpo: dict):
+        for tentativa in range(1, self.__tentativas + 1):
+            try:
+                # A vaga só é ocupada durante a chamada; na espera do backoff
+                # outras requisições podem usar o servidor
+                with self.__semaforo:
+                    return chamada(corpo)
+            except (requests.exceptions.RequestException, ErroLLM, ValueError) as e:
+                if tentativa == self.__tentativas:
+                    raise ErroLLM(f"LLM indisponível após {tentativa} tentativas: {e}") from e
+
+                espera = self.__backoff * 2 ** (tentativa - 1)
+                logging.warning(f"⚠️ Falha na chamada ao LLM ({e}), nova tentativa em {espera:.0f}s")
+                time.sleep(espera)
+
+    def gerar_lote(self, prompts: list, system: str = None, options: dict = None) -> list:
+        """Gera as respostas de vários prompts em paralelo, respeitando o
+        limite de concorrência. Prompts que falham retornam None."""
+        def tarefa(prompt):
+            try:
+                return self.gerar(prompt, system, options)
+            except ErroLLM as e:
+                logging.error(f"❌ {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.__concorrencia) as executor:
+            return list(executor.map(tarefa, prompts))
@@ -1,5 +1,4 @@
 import pandas as pd
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -8,8 +7,18 @@ import requests
 from datetime import datetime, date, timedelta
 import yfinance as yf
 from classes.PostgreSQL import PostgresSQL
-from config import DB_CONNECTION_STRING
+from classes.PoolNavegadores import PoolNavegadores
+from classes.CacheDisco import CacheDisco, CacheIndisponivel
+from classes.ArmazemPrecos import ArmazemPrecos
+from pypika import Table, Query, functions as fn
+from config import (DB_CONNECTION_STRING, YAHOO_LOTE, YAHOO_THREADS,
+                    YAHOO_TENTATIVAS, YAHOO_BACKOFF, JANELA_PRECOS_DIAS, JANELA_BACKFILL_DIAS,
+                    SCRAPER_DRIVERS, NAVEGADOR_HEADLESS, USER_AGENT, CACHE_DATA_REFERENCIA)
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+import time
+import json
+import pickle
 import logging
 
 logging.basicConfig(level=logging.INFO, 
@@ -19,36 +28,82 @@ logging.basicConfig(level=logging.INFO,
 
 
 class ColetorDados:
-    def __init__(self):
+    def __init__(self, baixar_precos=None, baixar_serie=None, postgre: PostgresSQL = None,
+                 cache: CacheDisco = None, armazem: ArmazemPrecos = None,
+                 pool_navegadores=PoolNavegadores):
         self.__options = webdriver.ChromeOptions()
         self.__options.add_argument("--start-maximized")
-        self.__postgre = PostgresSQL(DB_CONNECTION_STRING)
+        if NAVEGADOR_HEADLESS:
+            self.__options.add_argument("--headless=new")
+            self.__options.add_argument("--window-size=1920,1080")
+        self.__postgre = postgre or PostgresSQL(DB_CONNECTION_STRING)
+        self.__cache = cache or CacheDisco()
+        self.__armazem = armazem or ArmazemPrecos()
+        # Fábrica (iniciar_driver, tamanho, preparar) -> pool de navegadores
+        self.__pool_navegadores = pool_navegadores
+        self.__precos_coletados = []
+        # Fontes de preços, que podem ser trocadas por stubs locais:
+        # (tickers_yahoo, inicio, fim) -> DataFrame no formato do yf.download
+        # e (url) -> lista de {"data", "valor"} como na API do BCB
+        self.__baixar_precos = baixar_precos or self.__yahoo_download
+        self.__baixar_serie = baixar_serie or self.__bcb_download
   
+    def __hoje(self) -> datetime:
+        # As chaves de cache dos preços incluem a data final da coleta; com
+        # uma data de referência fixa, a mesma coleta pode ser repetida offline
+        if CACHE_DATA_REFERENCIA:
+            return datetime.strptime(CACHE_DATA_REFERENCIA, "%Y-%m-%d")
+        return datetime.today()
+
     def __iniciar_driver(self):
         return webdriver.Chrome(options=self.__options)
 
     def __processar_tabelas(self, html):
-        soup = BeautifulSoup(html, "html.parser")
-        tables = soup.find_all("table")
-        
-        if not tables:
-            return
+        # O lxml lê todas as tabelas da página em uma única passada
+        try:
+            tabelas = pd.read_html(StringIO(html), flavor="lxml")
+        except ValueError:
+            return pd.DataFrame()
 
-        df_total = pd.DataFrame()
-        for i, table in enumerate(tables):
-            try:
-                df = pd.read_html(StringIO(str(table)))[0]
-                df_total = pd.concat([df_total, df], ignore_index=True)
-            except Exception as e:
-                print(f"Erro ao processar tabela {i+1}: {e}")
-        
-        return df_total
+        if not tabelas:
+            return pd.DataFrame()
 
-    def __investidor10(self, categoria:int):
-        contador = 1
-        paginas = 1000
-        df_geral = pd.DataFrame()
+        return pd.concat(tabelas, ignore_index=True)
 
+    def __buscar_html(self, url: str) -> str:
+        resposta = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=30)
+        resposta.raise_for_status()
+        return resposta.text
+
+    def __aplicar_filtros_investidor10(self, driver, url: str, segmento: str, setor: str):
+        driver.get(url)
+
+        try:
+            driver.find_element(By.XPATH, '//*[@id="page-ranking"]/section[1]/div/div[1]/div/div[3]').click()
+        except Exception:
+            driver.find_element(By.XPATH, '//*[@id="pop_up_ads"]/div/button').click()
+            driver.find_element(By.XPATH, '//*[@id="page-ranking"]/section[1]/div/div[1]/div/div[3]').click()
+
+        WebDriverWait(driver, 8).until(EC.element_to_be_clickable((By.XPATH, segmento))).click()
+        WebDriverWait(driver, 8).until(EC.element_to_be_clickable((By.XPATH, setor))).click()
+
+        WebDriverWait(driver, 30).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="swal2-content"]/div[2]/span[2]'))).click()
+
+    def __contar_paginas(self, driver, url: str) -> int:
+        driver.get(url)
+        link_paginas = WebDriverWait(driver, 10).until(
+            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "ul.pagination-list li.page-item a.page-link"))
+        )
+
+        numeros_paginas = [int(link.text.strip()) for link in link_paginas if link.text.strip().isdigit()]
+        return max(numeros_paginas) if numeros_paginas else 1
+
+    def __ler_pagina(self, driver, url: str) -> str:
+        driver.get(url)
+        WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
+        return driver.page_source
+
+    def __investidor10(self, categoria:int):
         if categoria == 1:
             tipo = "acoes"
             segmento = '//*[@id="swal2-content"]/div[1]/div[2]/div[6]/div[12]/label/span'
@@ -63,45 +118,50 @@ class ColetorDados:
             logging.error('❌ Categoria não encontrada!')
             return pd.DataFrame()
 
-        while contador <= paginas:
-            driver = self.__iniciar_driver()
-            driver.get(f"https://investidor10.com.br/{tipo}/?page={contador}")
+        url = f"https://investidor10.com.br/{tipo}/?page={{}}"
 
-            try:
-                if contador == 1:
-                    link_paginas = WebDriverWait(driver, 10).until(
-                        EC.presence_of_all_elements_located((By.CSS_SELECTOR, "ul.pagination-list li.page-item a.page-link"))
-                    )
-
-                    numeros_paginas = [int(link.text.strip()) for link in link_paginas if link.text.strip().isdigit()]
-                    logging.info(f'❕ O site possui {len(numeros_paginas)} paginas')
-                    paginas = max(numeros_paginas) if numeros_paginas else 1
-
-                # Interações com elementos da página
-                driver.find_element(By.XPATH, '//*[@id="page-ranking"]/section[1]/div/div[1]/div/div[3]').click()
-
-                WebDriverWait(driver, 8).until(EC.element_to_be_clickable((By.XPATH, segmento))).click()
-                WebDriverWait(driver, 8).until(EC.element_to_be_clickable((By.XPATH, setor))).click()
-
-                WebDriverWait(driver, 30).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="swal2-content"]/div[2]/span[2]'))).click()
-
-                html = driver.page_source
-                df_pagina = self.__processar_tabelas(html)
-
-                if not df_pagina.empty:
-                    df_geral = pd.concat([df_geral, df_pagina], ignore_index=True)
-                contador += 1
+        # Os filtros de colunas são aplicados uma vez por driver; depois
+        # disso cada driver só navega entre as páginas
+        def preparar(driver):
+            self.__aplicar_filtros_investidor10(driver, url.format(1), segmento, setor)
 
+        # Os drivers só são criados se alguma página não estiver no cache
+        with self.__pool_navegadores(self.__iniciar_driver, SCRAPER_DRIVERS, preparar) as pool:
+            try:
+                paginas = int(self.__cache.buscar(
+                    "investidor10", CacheDisco.chave(tipo, "paginas"),
+                    lambda: str(pool.executar(self.__contar_paginas, url.format(1))).encode()
+                ))
             except Exception as e:
-                try:
-                    driver.find_element(By.XPATH,'//*[@id="pop_up_ads"]/div/button').click()
-                except:
-                    logging.error(e)
-                contador += 1
-            finally:
-                driver.quit()
+                logging.error(f"❌ Não foi possível obter o número de páginas: {e}")
+                return pd.DataFrame()
+
+            logging.info(f'❕ O site possui {paginas} paginas')
+
+            chaves = {p: CacheDisco.chave(url.format(p)) for p in range(1, paginas + 1)}
+            htmls = {p: self.__cache.obter("investidor10", chave) for p, chave in chaves.items()}
+            faltantes = [p for p, html in htmls.items() if html is None]
+
+            if faltantes and self.__cache.offline:
+                logging.warning(f"⚠️ {len(faltantes)} páginas ausentes no cache (modo offline)")
+            elif faltantes:
+                baixadas = pool.mapear(
+                    lambda driver, pagina: self.__ler_pagina(driver, url.format(pagina)),
+                    faltantes
+                )
+                for pagina, html in zip(faltantes, baixadas):
+                    if html is None:
+                        continue
+                    html = html.encode("utf-8")
+                    self.__cache.salvar("investidor10", chaves[pagina], html)
+                    htmls[pagina] = html
+
+        dfs = [self.__processar_tabelas(html.decode("utf-8")) for html in htmls.values() if html is not None]
+        dfs = [df for df in dfs if not df.empty]
+        if not dfs:
+            return pd.DataFrame()
 
-        return df_geral
+        return pd.concat(dfs, ignore_index=True)
 
     def __coletar_acoes(self):
         logging.info("🔄️ Inicianco coleta de ações")
@@ -135,26 +195,44 @@ class ColetorDados:
             
         return df_geral
 
+    def __ler_pagina_etf(self, driver) -> str:
+        driver.get("https://www.etfsbrasil.com.br")
+        botao_cookies = WebDriverWait(driver, 30).until(
+            EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div[2]/div/button"))
+        )
+        botao = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/main/div[1]/div/div[3]/button"))
+        )
+        botao_cookies.click()
+        botao.click()
+        WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
+        return driver.page_source
+
+    def __html_etf_navegador(self):
+        with self.__pool_navegadores(self.__iniciar_driver, 1) as pool:
+            return pool.executar(self.__ler_pagina_etf)
+
+    def __html_etf(self) -> bytes:
+        # Tenta primeiro a página via HTTP simples; o navegador só é usado
+        # se a tabela não vier no HTML estático
+        try:
+            html = self.__buscar_html("https://www.etfsbrasil.com.br")
+            if 'Ticker' in self.__processar_tabelas(html).columns:
+                return html.encode("utf-8")
+        except Exception as e:
+            logging.warning(f"⚠️ Falha ao buscar ETFs via HTTP: {e}")
+
+        logging.info("❕ Tabela de ETFs indisponível via HTTP, usando navegador")
+        return self.__html_etf_navegador().encode("utf-8")
+
     def __coletar_etf(self):
         logging.info("🔄️ Inicianco coleta de ETFs")
 
-        driver = self.__iniciar_driver()
-        try:
-            driver.get("https://www.etfsbrasil.com.br")
-            botao_cookies = WebDriverWait(driver, 30).until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/div[2]/div/button"))
-            )
-            botao = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/div[1]/main/div[1]/div/div[3]/button"))
-            )
-            botao_cookies.click()
-            botao.click()
-            WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
-            html = driver.page_source
-        finally:
-            driver.quit()
-        
-        df = self.__processar_tabelas(html)
+        html = self.__cache.buscar(
+            "etfsbrasil", CacheDisco.chave("https://www.etfsbrasil.com.br"), self.__html_etf
+        )
+        df = self.__processar_tabelas(html.decode("utf-8"))
+
         df = df.rename(columns={'Categoria': 'SEGMENTO', 'Ticker': 'TICKER', 'Resumo': 'RESUMO'})
         df['CATEGORIA'] = 2
         df = df[['TICKER', 'RESUMO', 'SEGMENTO', 'CATEGORIA']]
@@ -162,13 +240,13 @@ class ColetorDados:
         logging.info("✅ Coleta de ETFs finalizadas!")
         return df
 
-    def __coletar_preco_renda_fixa(self):
+    def __coletar_preco_renda_fixa(self, marcas: dict):
         logging.info("🔄️ Inicianco coleta preços renda fixa")
-        ano_atual = datetime.today().year
-        ano_inicial = ano_atual - 1
+        hoje = self.__hoje()
+        ano_inicial = hoje.year - 1
+        inicio_padrao = date(ano_inicial, 1, 1)
 
-        data_inicial = date(ano_inicial,1,1).strftime("%d/%m/%Y")
-        data_final = datetime.today().strftime("%d/%m/%Y")
+        data_final = hoje.strftime("%d/%m/%Y")
 
         dicionario = {
         "SELIC" : 1178,
@@ -179,75 +257,284 @@ class ColetorDados:
         dfs = []
 
         for name, code in dicionario.items():
+            # Busca apenas a partir da última data já gravada para a série
+            data_inicial = marcas.get(name, inicio_padrao).strftime("%d/%m/%Y")
             url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados?formato=json&dataInicial={data_inicial}&dataFinal={data_final}"
-            data =  requests.get(url).json()
+            try:
+                data = self.__buscar_serie_bcb(url)
+            except Exception as e:
+                logging.warning(f"❌ Erro na série {name}: {e}")
+                continue
+
             df = pd.DataFrame(data)
+
+            if df.empty:
+                continue
+
             df['TICKER'] = name
             dfs.append(df)
 
+        if not dfs:
+            logging.info("✅ Preços renda fixa já atualizados")
+            return
+
         df_fix = pd.concat(dfs,ignore_index=True)
         df_fix = df_fix.rename(columns={'data':'DATA', 'valor': 'PRECO'})
         
         df_fix['DATA'] = pd.to_datetime(df_fix['DATA'], dayfirst=True).dt.strftime('%Y-%m-%d')
-        self.__postgre.sincronizar('PRECOS', df_fix, ['TICKER', 'DATA'])
+        self.__sincronizar_precos(df_fix)
         logging.info("✅ de preços renda fixa concluída")
 
+    def __buscar_serie_bcb(self, url: str) -> list:
+        chave = CacheDisco.chave(url)
+        conteudo = self.__cache.obter("bcb", chave)
+        if conteudo is not None:
+            return json.loads(conteudo)
+
+        if self.__cache.offline:
+            raise CacheIndisponivel(f"Entrada 'bcb/{chave}' ausente no cache (modo offline)")
+
+        data = self.__baixar_serie(url)
+
+        # Respostas de erro e séries vazias não vão para o cache, para que a
+        # próxima coleta pergunte de novo
+        if isinstance(data, list) and data:
+            self.__cache.salvar("bcb", chave, json.dumps(data).encode("utf-8"))
+
+        return data if isinstance(data, list) else []
+
+    def __bcb_download(self, url: str):
+        resposta = requests.get(url, timeout=30)
+        resposta.raise_for_status()
+        return resposta.json()
+
     def coletar_ativos(self):
-        acao = self.__coletar_acoes()
-        etf = self.__coletar_etf()
-        fii = self.__coletar_fiis()
+        # Ações e FIIs usam pools de navegadores independentes e rodam em
+        # paralelo; os ETFs são coletados enquanto isso
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futuro_acao = executor.submit(self.__coletar_acoes)
+            futuro_fii = executor.submit(self.__coletar_fiis)
+            etf = self.__coletar_etf()
+            acao = futuro_acao.result()
+            fii = futuro_fii.result()
 
         df = pd.concat([acao, fii, etf], ignore_index=True)
         self.__postgre.sincronizar('ATIVOS', df, ['TICKER'])
         logging.info("✅ Dados atualizados!")
 
-    def __coletar_precos_renda_variavel(self):
-        logging.info("🔄️ Inicianco coleta de preços de renda variável")
-        df = self.__postgre.read('ATIVOS')
-        tickers = df['TICKER'].to_list()
+    def __yahoo_download(self, tickers_yahoo: list, inicio, fim) -> pd.DataFrame:
+        # O yf.download guarda o resultado em estado global do módulo, então
+        # chamadas simultâneas se sobrescrevem. As requisições de cada lote são
+        # paralelizadas pelo próprio yfinance (threads) e os lotes são baixados
+        # um de cada vez.
+        return yf.download(
+            tickers_yahoo,
+            start=inicio,
+            end=fim,
+            interval="1mo",
+            auto_adjust=True,
+            group_by="ticker",
+            threads=YAHOO_THREADS,
+            progress=False,
+        )
+
+    def __extrair_fechamento(self, dados: pd.DataFrame, ticker_yahoo: str) -> pd.Series:
+        if dados is None or dados.empty:
+            return pd.Series(dtype=float)
+
+        if isinstance(dados.columns, pd.MultiIndex):
+            if ticker_yahoo in dados.columns.get_level_values(0):
+                serie = dados[ticker_yahoo]["Close"]
+            elif ticker_yahoo in dados.columns.get_level_values(1):
+                serie = dados["Close"][ticker_yahoo]
+            else:
+                return pd.Series(dtype=float)
+        elif "Close" in dados.columns:
+            serie = dados["Close"]
+        else:
+            return pd.Series(dtype=float)
+
+        return serie.dropna()
+
+    def __formatar_precos(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.rename(columns={"Date": "DATA", "Close": "PRECO"})
+        df['DATA'] = pd.to_datetime(df['DATA']).dt.date.astype(str)
+        df['PRECO'] = df['PRECO'].astype(float)
+        return df.drop_duplicates(subset=['TICKER', 'DATA'], keep='first')
 
-        tickers_yahoo = [t + ".SA" for t in tickers]
-        inicio = datetime.today() - timedelta(days=90)
-        fim = datetime.today()
+    def __baixar_lote(self, tickers: list, inicio, fim):
+        chave = CacheDisco.chave([t + ".SA" for t in tickers], str(inicio)[:10], str(fim)[:10])
+        conteudo = self.__cache.obter("yahoo", chave)
+        if conteudo is not None:
+            return pickle.loads(conteudo), {}
+
+        if self.__cache.offline:
+            erro = CacheIndisponivel(f"Entrada 'yahoo/{chave}' ausente no cache (modo offline)")
+            return pd.DataFrame(), {t: str(erro) for t in tickers}
 
         dfs = []
-        logging.info(f"🔄️ Iniciando download de preços para {len(tickers_yahoo)} tickers...")
-        
-        for original, yahoo_ticker in zip(tickers, tickers_yahoo):
+        pendentes = list(tickers)
+
+        for tentativa in range(1, YAHOO_TENTATIVAS + 1):
+            # O yf.download não levanta exceção para tickers que falham: as
+            # colunas deles vêm ausentes, vazias ou só com NaN. Esses tickers
+            # ficam pendentes e só eles são pedidos de novo
             try:
-                dados = yf.download(yahoo_ticker, start=inicio, end=fim, interval="1mo", auto_adjust=True)
+                dados = self.__baixar_precos([t + ".SA" for t in pendentes], inicio, fim)
+                motivo = "sem dados retornados"
+            except Exception as e:
+                dados, motivo = None, str(e)
 
-                if dados is not None and not dados.empty:
-                    dados = dados.reset_index()
+            faltando = []
+            for ticker in pendentes:
+                serie = self.__extrair_fechamento(dados, ticker + ".SA")
 
-                    if isinstance(dados.columns, pd.MultiIndex):
-                        dados.columns = dados.columns.get_level_values(0)
-                    
-                    dados = dados[["Date", "Close"]].copy()
-                    dados['TICKER'] = original
-                    dfs.append(dados)
-            except Exception as e:
-                print(f"❌ Erro em {original}: {e}")
+                if serie.empty:
+                    faltando.append(ticker)
+                    continue
 
-        
-        if not dfs:
-            print("Nenhum dado de preço foi coletado. Encerrando.")
+                dfs.append(pd.DataFrame({"Date": serie.index, "Close": serie.values, "TICKER": ticker}))
+
+            pendentes = faltando
+            if not pendentes or tentativa == YAHOO_TENTATIVAS:
+                break
+
+            espera = YAHOO_BACKOFF * 2 ** (tentativa - 1)
+            logging.warning(
+                f"⚠️ {len(pendentes)} de {len(tickers)} tickers sem dados ({motivo}), "
+                f"tentativa {tentativa}/{YAHOO_TENTATIVAS}. Repetindo em {espera:.0f}s"
+            )
+            time.sleep(espera)
+
+        falhas = {t: motivo for t in pendentes}
+        df = self.__formatar_precos(pd.concat(dfs, ignore_index=True)) if dfs else pd.DataFrame()
+
+        # Só lotes completos vão para o cache; com falhas, a próxima coleta
+        # baixa o lote de novo em vez de repetir um resultado parcial
+        if not falhas and not df.empty:
+            self.__cache.salvar("yahoo", chave, pickle.dumps(df))
+
+        return df, falhas
+
+    def __sincronizar_precos(self, df: pd.DataFrame):
+        # Cada lote vai para PRECOS na hora; o armazém local (matriz datas ×
+        # tickers) é regravado uma única vez, no fim da coleta
+        self.__postgre.sincronizar('PRECOS', df, ['TICKER', 'DATA'])
+        self.__precos_coletados.append(df)
+
+    def __atualizar_armazem(self):
+        if self.__precos_coletados:
+            self.__armazem.atualizar(pd.concat(self.__precos_coletados, ignore_index=True))
+            self.__precos_coletados = []
+
+    def __historico(self) -> pd.DataFrame:
+        """Primeira e última data gravadas em PRECOS por ticker (índice TICKER,
+        colunas PRIMEIRA e ULTIMA)."""
+        precos_tb = Table("PRECOS")
+        query = (
+            Query.from_(precos_tb)
+            .select(precos_tb.TICKER,
+                    fn.Min(precos_tb.DATA).as_("PRIMEIRA"),
+                    fn.Max(precos_tb.DATA).as_("ULTIMA"))
+            .groupby(precos_tb.TICKER)
+        )
+
+        df = self.__postgre.query(query.get_sql())
+        if df is None or df.empty:
+            return pd.DataFrame(columns=["PRIMEIRA", "ULTIMA"], index=pd.Index([], name="TICKER"))
+
+        df = df.set_index("TICKER")
+        return df.assign(PRIMEIRA=pd.to_datetime(df["PRIMEIRA"]).dt.date,
+                         ULTIMA=pd.to_datetime(df["ULTIMA"]).dt.date)
+
+    def __coletar_precos_renda_variavel(self, inicios: dict):
+        logging.info("🔄️ Inicianco coleta de preços de renda variável")
+        fim = self.__hoje()
+
+        # Tickers com a mesma data inicial são baixados juntos
+        grupos = {}
+        for ticker, inicio in inicios.items():
+            if inicio < fim.date():
+                grupos.setdefault(inicio, []).append(ticker)
+
+        lotes = [
+            (tickers[i:i + YAHOO_LOTE], inicio)
+            for inicio, tickers in grupos.items()
+            for i in range(0, len(tickers), YAHOO_LOTE)
+        ]
+
+        if not lotes:
+            logging.info("✅ Preços de renda variável já atualizados")
             return
 
-        df_final = pd.concat(dfs, ignore_index=True)
-        df_final.rename(columns={"Date": "DATA", "Close": "PRECO"}, inplace=True)
-        df_final['DATA'] = pd.to_datetime(df_final['DATA']).dt.strftime('%Y-%m-%d')
-        df_final['DATA'] = pd.to_datetime(df_final['DATA']).dt.date.astype(str)
-        df_final['PRECO'] = df_final['PRECO'].astype(float)
-        df_final = df_final.drop_duplicates(subset=['TICKER', 'DATA'], keep='first') 
+        logging.info(f"🔄️ Iniciando download de preços para {sum(len(t) for t, _ in lotes)} tickers em {len(lotes)} lotes...")
+
+        total = 0
+        falhas = {}
 
-        logging.info(f"✅ Download concluído. {len(df_final)} registros de preços para sincronizar.")
+        # Cada lote é gravado em PRECOS assim que termina de baixar
+        for lote, inicio in lotes:
+            df_lote, falhas_lote = self.__baixar_lote(lote, inicio, fim)
+            falhas.update(falhas_lote)
 
+            if df_lote.empty:
+                continue
 
-        self.__postgre.sincronizar('PRECOS', df_final, ['TICKER', 'DATA'])
-        logging.info("✅ Sincronização de preços renda variável concluída")
+            self.__sincronizar_precos(df_lote)
+            total += len(df_lote)
 
+        for ticker, motivo in falhas.items():
+            logging.warning(f"❌ Erro em {ticker}: {motivo}")
 
-    def coletar_precos(self):
-        self.__coletar_precos_renda_variavel()
-        self.__coletar_preco_renda_fixa()
+        if total == 0:
+            logging.error("❌ Nenhum dado de preço foi coletado.")
+            return
+
+        logging.info(f"✅ Sincronização de preços renda variável concluída. {total} registros, {len(falhas)} tickers com falha")
+
+    def coletar_precos(self, completo: bool = False):
+        """Coleta incremental: cada ticker é buscado a partir da última data
+        já gravada em PRECOS. Tickers sem histórico recebem a janela longa do
+        backfill. Com completo=True, a janela padrão dos demais é baixada
+        novamente."""
+        if not self.__armazem.existe():
+            logging.info("🔄️ Criando armazém local de preços a partir de PRECOS")
+            self.__armazem.reconstruir(self.__postgre.read('PRECOS'))
+
+        tickers = self.__postgre.read('ATIVOS')['TICKER'].to_list()
+        ultimas = self.__historico()["ULTIMA"].to_dict()
+        hoje = self.__hoje()
+        inicio_padrao = (hoje - timedelta(days=JANELA_PRECOS_DIAS)).date()
+        inicio_backfill = (hoje - timedelta(days=JANELA_BACKFILL_DIAS)).date()
+
+        inicios = {
+            t: inicio_backfill if t not in ultimas else inicio_padrao if completo else ultimas[t]
+            for t in tickers
+        }
+        marcas = {} if completo else ultimas
+
+        try:
+            self.__coletar_precos_renda_variavel(inicios)
+            self.__coletar_preco_renda_fixa(marcas)
+        finally:
+            self.__atualizar_armazem()
+
+    def backfill_precos(self, dias: int = JANELA_BACKFILL_DIAS):
+        """Baixa o histórico longo dos tickers cujo histórico em PRECOS começa
+        depois do início da janela (sem nenhum preço ou coletados só com a
+        janela curta). Ativos listados há menos tempo que a janela são pedidos
+        de novo a cada backfill; o sincronizar descarta o que já existe."""
+        tickers = self.__postgre.read('ATIVOS')['TICKER'].to_list()
+        primeiras = self.__historico()["PRIMEIRA"].to_dict()
+        inicio = (self.__hoje() - timedelta(days=dias)).date()
+
+        # Os preços são mensais: um histórico que começa até um mês depois
+        # do início da janela já está completo
+        limite = inicio + timedelta(days=31)
+        incompletos = [t for t in tickers if t not in primeiras or primeiras[t] > limite]
+        logging.info(f"🔄️ Backfill de {len(incompletos)} tickers com histórico incompleto")
+
+        try:
+            self.__coletar_precos_renda_variavel({t: inicio for t in incompletos})
+        finally:
+            self.__atualizar_armazem()
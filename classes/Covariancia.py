@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import pickle
+import numpy as np
+import pandas as pd
+from classes.CacheDisco import CacheDisco
+from config import COVARIANCIA_METODO, EWMA_LAMBDA
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+class ModeloFatorial:
+    """Covariância na forma Σ = B F Bᵀ + diag(d), guardada em O(N·k)."""
+
+    def __init__(self, tickers: list, cargas: np.ndarray, cov_fatores: np.ndarray, especifica: np.ndarray):
+        self.tickers = list(tickers)
+        self.cargas = cargas
+        self.cov_fatores = cov_fatores
+        self.especifica = especifica
+
+    @property
+    def columns(self):
+        return pd.Index(self.tickers)
+
+    def reindexar(self, tickers: list) -> "ModeloFatorial":
+        posicao = {t: i for i, t in enumerate(self.tickers)}
+        indices = [posicao[t] for t in tickers]
+        return ModeloFatorial(tickers, self.cargas[indices], self.cov_fatores, self.especifica[indices])
+
+    def escalar(self, fator: float) -> "ModeloFatorial":
+        return ModeloFatorial(self.tickers, self.cargas, self.cov_fatores * fator, self.especifica * fator)
+
+    def multiplicar(self, x: np.ndarray) -> np.ndarray:
+        return self.cargas @ (self.cov_fatores @ (self.cargas.T @ x)) + self.especifica * x
+
+    def diagonal(self) -> np.ndarray:
+        return np.einsum("ij,jk,ik->i", self.cargas, self.cov_fatores, self.cargas) + self.especifica
+
+    def variancias(self, pesos: np.ndarray) -> np.ndarray:
+        """Variância de cada linha de `pesos` (matriz carteiras × ativos)."""
+        exposicao = pesos @ self.cargas
+        return np.einsum("ij,jk,ik->i", exposicao, self.cov_fatores, exposicao) + (pesos ** 2) @ self.especifica
+
+    def matriz(self) -> pd.DataFrame:
+        denso = self.cargas @ self.cov_fatores @ self.cargas.T + np.diag(self.especifica)
+        return pd.DataFrame(denso, index=self.tickers, columns=self.tickers)
+
+
+class EstimadorCovariancia:
+    """Estimadores de covariância anualizada a partir de retornos.
+
+    - amostral: covariância amostral simples;
+    - ledoit_wolf: encolhimento de Ledoit-Wolf em direção à identidade escalada;
+    - ewma: médias móveis exponenciais (RiskMetrics), com fator `lambda_ewma`;
+    - fatorial: modelo de fatores por segmento e categoria (ModeloFatorial).
+
+    Os resultados ficam em cache no disco, indexados pelo conjunto de
+    tickers, intervalo de datas e parâmetros do método.
+    """
+
+    METODOS = ["amostral", "ledoit_wolf", "ewma", "fatorial"]
+
+    def __init__(self, metodo: str = COVARIANCIA_METODO, periodos: int = 252,
+                 lambda_ewma: float = EWMA_LAMBDA, cache: CacheDisco = None, usar_cache: bool = True):
+        if metodo not in self.METODOS:
+            raise ValueError(f"Método de covariância desconhecido: {metodo}")
+
+        self.__metodo = metodo
+        self.__periodos = periodos
+        self.__lambda_ewma = lambda_ewma
+        self.__cache = (cache or CacheDisco()) if usar_cache else None
+
+    @staticmethod
+    def variancia(cov, pesos: np.ndarray) -> float:
+        if isinstance(cov, ModeloFatorial):
+            return float(cov.variancias(np.asarray(pesos)[None, :])[0])
+
+        pesos = np.asarray(pesos)
+        return float(pesos @ np.asarray(cov) @ pesos)
+
+    def estimar(self, retornos: pd.DataFrame, grupos: pd.DataFrame = None):
+        """Retorna um DataFrame de covariância ou, no método fatorial, um
+        ModeloFatorial. `grupos` é indexado por ticker com as colunas
+        SEGMENTO e CATEGORIA (só usado pelo método fatorial)."""
+        if self.__cache is None:
+            return self.__calcular(retornos, grupos)
+
+        colunas = list(retornos.columns)
+        tickers = sorted(colunas)
+        retornos = retornos[tickers]
+
+        # O hash dos próprios retornos invalida a entrada quando um preço
+        # histórico é corrigido sem mudar o intervalo de datas
+        conteudo = hashlib.sha256(retornos.index.values.tobytes())
+        conteudo.update(retornos.to_numpy(dtype=float).tobytes())
+
+        chave = CacheDisco.chave(
+            self.__metodo, self.__periodos, self.__lambda_ewma, tickers,
+            str(retornos.index.min()), str(retornos.index.max()), len(retornos), conteudo.hexdigest(),
+            None if grupos is None or self.__metodo != "fatorial"
+            else grupos.reindex(tickers).astype(str).values.tolist()
+        )
+
+        cov = pickle.loads(self.__cache.buscar(
+            "covariancia", chave, lambda: pickle.dumps(self.__calcular(retornos, grupos))
+        ))
+
+        if isinstance(cov, ModeloFatorial):
+            return cov.reindexar(colunas)
+        return cov.loc[colunas, colunas]
+
+    def __calcular(self, retornos: pd.DataFrame, grupos: pd.DataFrame):
+        logging.info(f"🔄️ Estimando covariância ({self.__metodo}) para {retornos.shape[1]} ativos")
+        X = retornos.to_numpy(dtype=float)
+
+        if self.__metodo == "fatorial":
+            return self.__fatorial(retornos.columns, X, grupos)
+
+        if self.__metodo == "ledoit_wolf":
+            cov = self.__ledoit_wolf(X)
+        elif self.__metodo == "ewma":
+            cov = self.__ewma(X)
+        else:
+            cov = np.cov(X, rowvar=False)
+
+        return pd.DataFrame(cov * self.__periodos, index=retornos.columns, columns=retornos.columns)
+
+    def __ledoit_wolf(self, X: np.ndarray) -> np.ndarray:
+        T, n = X.shape
+        X = X - X.mean(axis=0)
+        S = X.T @ X / T
+
+        alvo = np.trace(S) / n
+        d2 = np.sum((S - alvo * np.eye(n)) ** 2)
+        b2 = (np.sum(np.sum(X ** 2, axis=1) ** 2) - T * np.sum(S ** 2)) / T ** 2
+        encolhimento = 0.0 if d2 == 0 else min(max(b2, 0.0), d2) / d2
+
+        logging.info(f"❕ Intensidade do encolhimento Ledoit-Wolf: {encolhimento:.3f}")
+        return encolhimento * alvo * np.eye(n) + (1 - encolhimento) * S
+
+    def __ewma(self, X: np.ndarray) -> np.ndarray:
+        T = X.shape[0]
+        pesos = self.__lambda_ewma ** np.arange(T - 1, -1, -1)
+        pesos /= pesos.sum()
+
+        media = pesos @ X
+        centrado = X - media
+        return (centrado * pesos[:, None]).T @ centrado
+
+    def __fatorial(self, tickers, X: np.ndarray, grupos: pd.DataFrame) -> ModeloFatorial:
+        T, n = X.shape
+        X = X - X.mean(axis=0)
+
+        if grupos is None:
+            grupos = pd.DataFrame(index=tickers, columns=["SEGMENTO", "CATEGORIA"])
+        grupos = grupos.reindex(tickers)
+
+        # Fatores: categorias e segmentos com pelo menos dois ativos
+        colunas_fatores = []
+        for coluna in ["CATEGORIA", "SEGMENTO"]:
+            valores = grupos[coluna].fillna("Não Classificado").astype(str).to_numpy()
+            for nome in pd.unique(valores):
+                membros = valores == nome
+                if membros.sum() >= 2:
+                    colunas_fatores.append(membros)
+
+        if not colunas_fatores:
+            colunas_fatores.append(np.ones(n, dtype=bool))
+
+        membros = np.column_stack(colunas_fatores).astype(float)
+        k = membros.shape[1]
+
+        # Retorno de cada fator: média dos retornos dos seus ativos
+        fatores = X @ membros / membros.sum(axis=0)
+
+        # Cargas: regressão de cada ativo apenas nos fatores a que pertence
+        cargas = np.zeros((n, k))
+        for i in range(n):
+            indices = np.flatnonzero(membros[i])
+            if indices.size == 0:
+                continue
+            cargas[i, indices] = np.linalg.lstsq(fatores[:, indices], X[:, i], rcond=None)[0]
+
+        residuos = X - fatores @ cargas.T
+        especifica = residuos.var(axis=0, ddof=1)
+        especifica = np.maximum(especifica, 1e-8 * max(float(np.mean(X.var(axis=0))), 1e-12))
+        cov_fatores = np.atleast_2d(np.cov(fatores, rowvar=False))
+
+        logging.info(f"❕ Modelo fatorial com {k} fatores")
+        return ModeloFatorial(
+            tickers, cargas, cov_fatores * self.__periodos, especifica * self.__periodos
+        )
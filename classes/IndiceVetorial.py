@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+import numpy as np
+from classes.ClienteLLM import ClienteLLM
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+class IndiceVetorial:
+    """Índice em memória para busca por similaridade de cosseno.
+
+    Cada item é representado pelo embedding do seu texto descritivo (em
+    cache no disco pelo ClienteLLM). A busca compara as consultas com todos
+    os itens numa única multiplicação de matrizes e cada item recebe a
+    maior similaridade entre as consultas.
+    """
+
+    def __init__(self, llm: ClienteLLM = None):
+        self.__llm = llm or ClienteLLM()
+        self.__nomes = []
+        self.__matriz = np.empty((0, 0), dtype=np.float32)
+        self.__assinatura = None
+
+    def __len__(self) -> int:
+        return len(self.__nomes)
+
+    @staticmethod
+    def __assinar(nomes: list, textos: list) -> str:
+        itens = sorted(zip(map(str, nomes), map(str, textos)))
+        return hashlib.sha256(json.dumps(itens, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def indexado(self, nomes: list, textos: list = None) -> bool:
+        """Se o índice já contém exatamente estes itens e textos."""
+        textos = nomes if textos is None else textos
+        return self.__assinatura == self.__assinar(nomes, textos)
+
+    @staticmethod
+    def __normalizar(vetores: np.ndarray) -> np.ndarray:
+        normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+        return vetores / np.where(normas > 0, normas, 1.0)
+
+    def indexar(self, nomes: list, textos: list = None):
+        """`textos` são as descrições usadas no embedding (padrão: os nomes)."""
+        textos = nomes if textos is None else textos
+        self.__nomes = list(nomes)
+        self.__matriz = self.__normalizar(self.__llm.embeddings(list(textos)))
+        self.__assinatura = self.__assinar(nomes, textos)
+        logging.info(f"🧭 Índice vetorial com {len(self.__nomes)} itens")
+
+    def buscar(self, consultas, k: int) -> list:
+        """Retorna até `k` pares (nome, similaridade), do mais ao menos similar."""
+        if not self.__nomes:
+            return []
+
+        if isinstance(consultas, str):
+            consultas = [consultas]
+
+        vetores = self.__normalizar(self.__llm.embeddings(list(consultas)))
+        similaridades = (vetores @ self.__matriz.T).max(axis=0)
+
+        k = min(k, len(self.__nomes))
+        melhores = np.argpartition(-similaridades, k - 1)[:k]
+        melhores = melhores[np.argsort(-similaridades[melhores])]
+
+        return [(self.__nomes[i], float(similaridades[i])) for i in melhores]
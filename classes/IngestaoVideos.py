@@ -0,0 +1,170 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from classes.Video import Video
+from classes.Resumo import Resumo
+from config import ARQUIVO_BAIXADOS, VIDEO_DOWNLOADS
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+ETAPAS = ["baixado", "transcrito", "resumido"]
+
+
+class IndiceVideos:
+    """Registro durável da última etapa concluída por vídeo.
+
+    Cada conclusão é acrescentada como uma linha `id;etapa` no arquivo e
+    gravada no disco imediatamente, então uma execução interrompida
+    retoma de onde parou. Na leitura vale a etapa mais avançada de cada id.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, arquivo: str = ARQUIVO_BAIXADOS):
+        self.__arquivo = arquivo
+        self.__etapas = {}
+
+        if os.path.exists(arquivo):
+            with open(arquivo, "r", encoding="utf-8") as f:
+                for linha in f:
+                    id_video, _, etapa = linha.strip().partition(";")
+                    if etapa in ETAPAS:
+                        self.__registrar(id_video, etapa)
+
+    def __registrar(self, id_video: str, etapa: str):
+        atual = self.__etapas.get(id_video)
+        if atual is None or ETAPAS.index(etapa) > ETAPAS.index(atual):
+            self.__etapas[id_video] = etapa
+
+    def etapa(self, id_video: str) -> str:
+        return self.__etapas.get(id_video)
+
+    def concluida(self, id_video: str, etapa: str) -> bool:
+        atual = self.__etapas.get(id_video)
+        return atual is not None and ETAPAS.index(atual) >= ETAPAS.index(etapa)
+
+    def marcar(self, id_video: str, etapa: str):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.__arquivo), exist_ok=True)
+            with open(self.__arquivo, "a", encoding="utf-8") as f:
+                f.write(f"{id_video};{etapa}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.__registrar(id_video, etapa)
+
+
+class IngestaoVideos:
+    """Processa uma lista de vídeos e playlists em três etapas encadeadas
+    (download → transcrição → resumo), cada uma consumindo a fila da
+    anterior. Downloads (rede), transcrição (CPU) e resumos (LLM) de vídeos
+    diferentes acontecem ao mesmo tempo, e etapas já concluídas segundo o
+    IndiceVideos são puladas.
+    """
+
+    def __init__(self, resumo: Resumo = None, indice: IndiceVideos = None,
+                 downloads: int = VIDEO_DOWNLOADS):
+        # Só o Resumo criado aqui é fechado em `fechar`; um recebido de fora
+        # continua aberto para quem o criou
+        self.__resumo_proprio = resumo is None
+        self.__resumo = resumo or Resumo()
+        self.__indice = indice or IndiceVideos()
+        self.__downloads = downloads
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+    def fechar(self):
+        if self.__resumo_proprio:
+            self.__resumo.fechar()
+
+    def __expandir(self, urls: list) -> list:
+        videos, vistos = [], set()
+
+        for url in urls:
+            try:
+                expandidas = [Video(u) for u in (Video.expandir(url) if "list=" in url else [url])]
+            except Exception as e:
+                logging.error(f"❌ Erro ao expandir {url}: {e}")
+                continue
+
+            for video in expandidas:
+                if video.get_id_video not in vistos:
+                    vistos.add(video.get_id_video)
+                    videos.append(video)
+
+        return videos
+
+    def __executar_etapa(self, video: Video, etapa: str, funcao) -> bool:
+        try:
+            funcao()
+        except Exception as e:
+            logging.error(f"❌ Falha na etapa '{etapa}' do vídeo {video.get_id_video}: {e}")
+            return False
+
+        self.__indice.marcar(video.get_id_video, etapa)
+        logging.info(f"✅ {video.get_id_video}: {etapa}")
+        return True
+
+    def __baixar(self, video: Video, fila_transcricao: queue.Queue):
+        if self.__executar_etapa(video, "baixado", video.baixar):
+            fila_transcricao.put(video)
+
+    def __transcrever(self, fila_transcricao: queue.Queue, fila_resumo: queue.Queue):
+        while (video := fila_transcricao.get()) is not None:
+            # O resumo dos trechos já transcritos começa antes do fim do vídeo
+            transcrever = lambda: video.transcrever(ao_avancar=self.__resumo.antecipar)
+            if self.__executar_etapa(video, "transcrito", transcrever):
+                fila_resumo.put(video)
+        fila_resumo.put(None)
+
+    def __resumir(self, fila_resumo: queue.Queue):
+        while (video := fila_resumo.get()) is not None:
+            def resumir():
+                if not self.__resumo.resumir_transcricao(video):
+                    raise RuntimeError("resumo não gerado")
+            self.__executar_etapa(video, "resumido", resumir)
+
+    def executar(self, urls: list):
+        videos = self.__expandir(urls)
+        fila_transcricao, fila_resumo = queue.Queue(), queue.Queue()
+
+        consumidores = [
+            threading.Thread(target=self.__transcrever, args=(fila_transcricao, fila_resumo)),
+            threading.Thread(target=self.__resumir, args=(fila_resumo,)),
+        ]
+        for consumidor in consumidores:
+            consumidor.start()
+
+        pendentes = 0
+        with ThreadPoolExecutor(max_workers=self.__downloads) as executor:
+            for video in videos:
+                id_video = video.get_id_video
+
+                # Retoma a partir da etapa seguinte à última concluída; se o
+                # arquivo intermediário sumiu, refaz a etapa que o gera
+                if self.__indice.concluida(id_video, "resumido"):
+                    continue
+                pendentes += 1
+
+                if (self.__indice.concluida(id_video, "transcrito")
+                        and os.path.exists(video.get_transcricao_audio)):
+                    fila_resumo.put(video)
+                elif (self.__indice.concluida(id_video, "baixado")
+                        and os.path.exists(video.get_audio)):
+                    fila_transcricao.put(video)
+                else:
+                    executor.submit(self.__baixar, video, fila_transcricao)
+
+        fila_transcricao.put(None)
+        for consumidor in consumidores:
+            consumidor.join()
+
+        logging.info(f"🎬 {pendentes} de {len(videos)} vídeos processados nesta execução")
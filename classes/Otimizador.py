@@ -0,0 +1,471 @@
+import logging
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, get_lapack_funcs
+from classes.Covariancia import ModeloFatorial
+from config import PESO_MAXIMO_ATIVO, PESO_MAXIMO_SEGMENTO, TAXA_LIVRE_RISCO
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+PERFIS = ["conservador", "moderado", "arrojado"]
+
+
+class Otimizador(ABC):
+    """Interface dos otimizadores de carteira usados por Carteira."""
+
+    @abstractmethod
+    def otimizar_perfis(self, retorno_medio: pd.Series, cov: pd.DataFrame,
+                        segmentos: pd.Series = None) -> dict:
+        """Retorna {perfil: pd.Series de pesos indexada pelos tickers}."""
+
+    def fronteira(self, retorno_medio: pd.Series, cov: pd.DataFrame,
+                  segmentos: pd.Series = None, pontos: int = 20) -> pd.DataFrame:
+        """Retorna um DataFrame com uma linha por ponto da fronteira eficiente
+        (colunas retorno, volatilidade, sharpe e o peso de cada ticker)."""
+        raise NotImplementedError(f"{type(self).__name__} não calcula fronteira eficiente")
+
+    @property
+    def calcula_fronteira(self) -> bool:
+        """Se a subclasse implementa `fronteira`."""
+        return type(self).fronteira is not Otimizador.fronteira
+
+
+class SolverQP:
+    """Resolve  min ½xᵀPx + qᵀx  sujeito a  l ≤ Ax ≤ u  por ADMM (mesmo
+    esquema do OSQP), com A = [I; 1ᵀ; μᵀ; S] (caixas por ativo, soma dos
+    pesos, retorno-alvo e segmentos).
+
+    A matriz do sistema linear (P + σI + AᵀρA) depende só de P, A e ρ, então
+    é fatorada uma vez e reaproveitada para qualquer q, l e u, o que permite
+    resolver vários perfis (ou pontos da fronteira) com a mesma covariância.
+    Só há nova fatoração quando o ρ adaptativo muda bastante.
+
+    P pode ser uma matriz densa ou um ModeloFatorial; neste caso o sistema é
+    resolvido pela identidade de Woodbury sem nunca montar a matriz N × N.
+
+    O ADMM chega rápido a uma precisão moderada e demora muito para passar
+    dela. Ao atingir `tol_polimento`, as restrições ativas são estimadas
+    pelos multiplicadores e o sistema KKT só com elas é resolvido
+    diretamente ("polimento", como no OSQP). Se a solução polida for
+    viável e os multiplicadores tiverem o sinal certo, ela é exata e o
+    ADMM para; senão as iterações continuam até `tol`.
+    """
+
+    def __init__(self, P, mu: np.ndarray, S: np.ndarray, rho: np.ndarray, sigma: float = 1e-6,
+                 alpha: float = 1.6, max_iter: int = 10000, tol: float = 1e-6,
+                 tol_polimento: float = 1e-4):
+        self.P = P
+        self.__mu = mu
+        self.__S = S
+        self.__n = len(mu)
+        self.__sigma = sigma
+        self.__alpha = alpha
+        self.__max_iter = max_iter
+        self.__tol = tol
+        self.__tol_polimento = tol_polimento
+        self.__fatorar(rho)
+
+    def __A(self, x: np.ndarray) -> np.ndarray:
+        return np.concatenate([x, [x.sum()], [self.__mu @ x], self.__S @ x])
+
+    def __At(self, v: np.ndarray) -> np.ndarray:
+        n = self.__n
+        return v[:n] + v[n] + v[n + 1] * self.__mu + self.__S.T @ v[n + 2:]
+
+    def __P(self, x: np.ndarray) -> np.ndarray:
+        if isinstance(self.P, ModeloFatorial):
+            return self.P.multiplicar(x)
+        return self.P @ x
+
+    def __fatorar(self, rho: np.ndarray):
+        self.__rho = rho
+        n, mu, S = self.__n, self.__mu, self.__S
+
+        # AᵀρA = diag(ρ_caixas) + termos de posto baixo (soma, retorno, segmentos)
+        U = np.column_stack([np.ones(n), mu, S.T])
+        C = np.concatenate([[rho[n], rho[n + 1]], rho[n + 2:]])
+
+        if isinstance(self.P, ModeloFatorial):
+            diagonal = self.P.especifica + self.__sigma + rho[:n]
+            U = np.column_stack([self.P.cargas, U])
+            C = np.block([
+                [self.P.cov_fatores, np.zeros((self.P.cov_fatores.shape[0], len(C)))],
+                [np.zeros((len(C), self.P.cov_fatores.shape[0])), np.diag(C)],
+            ])
+
+            # (D + UCUᵀ)⁻¹ = D⁻¹ − D⁻¹U·C(I + UᵀD⁻¹UC)⁻¹·UᵀD⁻¹
+            U_D = U / diagonal[:, None]
+            M = C @ np.linalg.inv(np.eye(C.shape[0]) + U.T @ U_D @ C)
+            self.__resolver_K = lambda v: v / diagonal - U_D @ (M @ (U_D.T @ v))
+        else:
+            # Resolve com o fator de Cholesky (duas substituições triangulares)
+            # em vez de montar K⁻¹. O potrs é o que o cho_solve chama, sem a
+            # validação dos argumentos, que pesa nas milhares de iterações
+            K = self.P + np.diag(self.__sigma + rho[:n]) + (U * C) @ U.T
+            fator, _ = cho_factor(K, lower=True, check_finite=False)
+            potrs, = get_lapack_funcs(("potrs",), (fator,))
+            self.__resolver_K = lambda v: potrs(fator, v, lower=1)[0]
+
+    def __P_bloco(self, livres: np.ndarray) -> np.ndarray:
+        if isinstance(self.P, ModeloFatorial):
+            cargas = self.P.cargas[livres]
+            return cargas @ self.P.cov_fatores @ cargas.T + np.diag(self.P.especifica[livres])
+        return self.P[np.ix_(livres, livres)]
+
+    def __resolver_ativas(self, q: np.ndarray, l: np.ndarray, u: np.ndarray,
+                          inferior: np.ndarray, superior: np.ndarray) -> tuple:
+        # Caixas ativas fixam o peso no limite; as demais linhas ativas
+        # (soma, retorno, segmentos) entram no sistema com os pesos livres
+        n = self.__n
+        fixos = inferior[:n] | superior[:n]
+        livres = np.flatnonzero(~fixos)
+        x = np.where(inferior[:n], l[:n], np.where(superior[:n], u[:n], 0.0))
+
+        linhas = np.flatnonzero(inferior[n:] | superior[n:])
+        G = np.vstack([np.ones(n), self.__mu, self.__S])[linhas]
+        b = np.where(inferior[n:], l[n:], u[n:])[linhas]
+
+        k = len(livres)
+        kkt = np.zeros((k + len(linhas), k + len(linhas)))
+        kkt[:k, :k] = self.__P_bloco(livres)
+        kkt[:k, k:] = G[:, livres].T
+        kkt[k:, :k] = G[:, livres]
+        lado = np.concatenate([-q[livres] - self.__P(x)[livres], b - G @ x])
+
+        solucao = np.linalg.solve(kkt, lado)
+        x[livres] = solucao[:k]
+        y = np.zeros(len(l))
+        y[n + linhas] = solucao[k:]
+        # Multiplicadores das caixas: o que sobra do gradiente nos pesos fixos
+        y[:n] = np.where(fixos, -(self.__P(x) + q + self.__At(y)), 0.0)
+
+        return x, y
+
+    def __polir(self, z: np.ndarray, y: np.ndarray, q: np.ndarray,
+                l: np.ndarray, u: np.ndarray, passos: int = 10) -> tuple:
+        """Resolve o KKT com as restrições ativas estimadas em (z, y) e corrige
+        a estimativa por alguns passos de conjunto ativo. Retorna (x, z, y) ou
+        None se não chegar a uma solução viável com multiplicadores de sinal
+        certo."""
+        igualdade = l == u
+        inferior = (z - l < -y) | igualdade
+        superior = (u - z < y) & ~inferior
+
+        for _ in range(passos):
+            try:
+                x, y = self.__resolver_ativas(q, l, u, inferior, superior)
+            except np.linalg.LinAlgError:
+                return None
+
+            Ax = self.__A(x)
+            folga = self.__tol * (1 + np.max(np.abs(Ax)))
+
+            # Restrições violadas passam a ser ativas no limite violado...
+            abaixo, acima = Ax < l - folga, Ax > u + folga
+            if abaixo.any() or acima.any():
+                inferior, superior = inferior | abaixo, (superior | acima) & ~abaixo
+                continue
+
+            # ...e, com a solução viável, as ativas com multiplicador de sinal
+            # errado são liberadas
+            soltar_inferior = inferior & ~igualdade & (y > folga)
+            soltar_superior = superior & (y < -folga)
+            if not soltar_inferior.any() and not soltar_superior.any():
+                return x, np.clip(Ax, l, u), y
+
+            inferior, superior = inferior & ~soltar_inferior, superior & ~soltar_superior
+
+        return None
+
+    def resolver(self, q: np.ndarray, l: np.ndarray, u: np.ndarray, inicial: tuple = None) -> tuple:
+        """Retorna (x, z, y). `inicial` aceita o (x, z, y) de uma solução
+        anterior para partir a quente."""
+        n, m = self.__n, len(l)
+        sigma, alpha = self.__sigma, self.__alpha
+
+        if inicial is None:
+            x, z, y = np.zeros(n), np.clip(np.zeros(m), l, u), np.zeros(m)
+        else:
+            x, z, y = (v.copy() for v in inicial)
+
+        # Precisão em que o próximo polimento é tentado; a cada tentativa
+        # que falha, o ADMM avança mais uma ordem de grandeza antes da seguinte
+        tol_polimento = self.__tol_polimento
+
+        for iteracao in range(1, self.__max_iter + 1):
+            rho = self.__rho
+
+            x_til = self.__resolver_K(sigma * x - q + self.__At(rho * z - y))
+            z_til = self.__A(x_til)
+
+            x = alpha * x_til + (1 - alpha) * x
+            z_rel = alpha * z_til + (1 - alpha) * z
+            z_novo = np.clip(z_rel + y / rho, l, u)
+            y = y + rho * (z_rel - z_novo)
+            z = z_novo
+
+            if iteracao % 25 == 0:
+                Ax, Px, Aty = self.__A(x), self.__P(x), self.__At(y)
+                residuo_primal = np.max(np.abs(Ax - z))
+                residuo_dual = np.max(np.abs(Px + q + Aty))
+
+                escala_primal = max(np.max(np.abs(Ax)), np.max(np.abs(z)), 1e-12)
+                escala_dual = max(np.max(np.abs(Px)), np.max(np.abs(Aty)), np.max(np.abs(q)), 1e-12)
+
+                if (residuo_primal <= self.__tol * (1 + escala_primal)
+                        and residuo_dual <= self.__tol * (1 + escala_dual)):
+                    break
+
+                if (residuo_primal <= tol_polimento * (1 + escala_primal)
+                        and residuo_dual <= tol_polimento * (1 + escala_dual)):
+                    polida = self.__polir(z, y, q, l, u)
+                    if polida is not None:
+                        return polida
+                    tol_polimento /= 10
+
+                # ρ adaptativo: equilibra os resíduos primal e dual relativos
+                razao = np.sqrt((residuo_primal / escala_primal) / max(residuo_dual / escala_dual, 1e-12))
+                if iteracao % 100 == 0 and (razao > 5 or razao < 0.2):
+                    self.__fatorar(np.clip(rho * razao, 1e-6, 1e6))
+
+        return x, z, y
+
+
+class OtimizadorMarkowitz(Otimizador):
+    """Média-variância long-only com limite por ativo e por segmento.
+
+    - conservador: mínima variância;
+    - moderado: mínima variância com retorno-alvo no meio do intervalo
+      entre a carteira de mínima variância e a de retorno máximo;
+    - arrojado: máximo índice de Sharpe, buscado ao longo da fronteira.
+    """
+
+    def __init__(self, peso_maximo_ativo: float = PESO_MAXIMO_ATIVO,
+                 peso_maximo_segmento: float = PESO_MAXIMO_SEGMENTO,
+                 taxa_livre_risco: float = TAXA_LIVRE_RISCO):
+        self.__peso_maximo_ativo = peso_maximo_ativo
+        self.__peso_maximo_segmento = peso_maximo_segmento
+        self.__taxa_livre_risco = taxa_livre_risco
+
+    def __limites(self, segmentos: pd.Series) -> tuple:
+        n = len(segmentos)
+        cap_ativo = max(self.__peso_maximo_ativo, 1.0 / n)
+        cap_segmento = self.__peso_maximo_segmento
+
+        grupos = segmentos.fillna("Não Classificado").to_numpy()
+        nomes, indices = np.unique(grupos, return_inverse=True)
+
+        capacidade = sum(min(cap_segmento, np.sum(indices == s) * cap_ativo) for s in range(len(nomes)))
+        if capacidade < 1.0:
+            logging.warning("⚠️ Limite por segmento inviável para os ativos selecionados — limite ignorado")
+            cap_segmento = 1.0
+
+        S = np.zeros((len(nomes), n))
+        S[indices, np.arange(n)] = 1.0
+
+        return cap_ativo, cap_segmento, S, indices
+
+    def __retorno_maximo(self, mu: np.ndarray, cap_ativo: float, cap_segmento: float, indices: np.ndarray) -> float:
+        # Para limites aninhados (ativo dentro de segmento) o preenchimento
+        # guloso pelo maior retorno é ótimo
+        restante = 1.0
+        usado_segmento = np.zeros(indices.max() + 1)
+        retorno = 0.0
+
+        for i in np.argsort(-mu):
+            peso = min(cap_ativo, cap_segmento - usado_segmento[indices[i]], restante)
+            if peso <= 0:
+                continue
+            usado_segmento[indices[i]] += peso
+            restante -= peso
+            retorno += peso * mu[i]
+            if restante <= 1e-12:
+                break
+
+        return retorno
+
+    def preparar(self, retorno_medio: pd.Series, cov: pd.DataFrame, segmentos: pd.Series = None) -> dict:
+        """Monta o problema e fatora a covariância uma única vez. O resultado
+        é usado por todos os perfis e pela fronteira eficiente."""
+        tickers = list(cov.columns)
+        n = len(tickers)
+        mu = retorno_medio.reindex(tickers).to_numpy(dtype=float)
+
+        if isinstance(cov, ModeloFatorial):
+            sigma, diagonal = cov, cov.diagonal()
+        else:
+            sigma = cov.to_numpy(dtype=float)
+            diagonal = np.diag(sigma)
+
+        if segmentos is None:
+            # Sem informação de segmento: cada ativo é seu próprio grupo
+            segmentos = pd.Series(tickers, index=tickers)
+        cap_ativo, cap_segmento, S, indices = self.__limites(segmentos.reindex(tickers))
+
+        # Normaliza a escala do objetivo para melhorar a convergência
+        escala = max(float(np.mean(diagonal)), 1e-12)
+        P = sigma.escalar(1 / escala) if isinstance(sigma, ModeloFatorial) else sigma / escala
+
+        # Linhas de A: caixas por ativo, soma dos pesos, retorno-alvo e segmentos
+        rho = np.full(n + 2 + S.shape[0], 0.1)
+        rho[n] = 1e2
+
+        l = np.concatenate([np.zeros(n), [1.0], [-np.inf], np.full(S.shape[0], -np.inf)])
+        u = np.concatenate([np.full(n, cap_ativo), [1.0], [np.inf], np.full(S.shape[0], cap_segmento)])
+
+        return {
+            "tickers": tickers,
+            "mu": mu,
+            "sigma": sigma,
+            "solver": SolverQP(P, mu, S, rho),
+            "l": l,
+            "u": u,
+            "linha_retorno": n + 1,
+            "retorno_maximo": self.__retorno_maximo(mu, cap_ativo, cap_segmento, indices),
+        }
+
+    def resolver_alvo(self, problema: dict, retorno_alvo: float = None, inicial: tuple = None) -> tuple:
+        """Mínima variância com retorno mínimo `retorno_alvo` (None = sem alvo)."""
+        l = problema["l"].copy()
+        if retorno_alvo is not None:
+            l[problema["linha_retorno"]] = retorno_alvo
+
+        q = np.zeros(len(problema["mu"]))
+        solucao = problema["solver"].resolver(q, l, problema["u"], inicial)
+        return self.__limpar(solucao[0]), solucao
+
+    def __limpar(self, w: np.ndarray) -> np.ndarray:
+        w = np.clip(w, 0.0, None)
+        w[w < 1e-6] = 0.0
+        return w / w.sum()
+
+    def __variancias(self, problema: dict, pesos: np.ndarray) -> np.ndarray:
+        sigma = problema["sigma"]
+        if isinstance(sigma, ModeloFatorial):
+            return sigma.variancias(pesos)
+        return np.einsum("ij,jk,ik->i", pesos, sigma, pesos)
+
+    def __sharpe(self, problema: dict, w: np.ndarray) -> float:
+        vol = float(np.sqrt(self.__variancias(problema, w[None, :])[0]))
+        return (float(w @ problema["mu"]) - self.__taxa_livre_risco) / vol if vol > 0 else 0.0
+
+    def __max_sharpe(self, problema: dict, r_min: float, r_max: float, inicial: tuple) -> np.ndarray:
+        # O Sharpe é unimodal ao longo da fronteira: busca pela seção áurea
+        razao = (np.sqrt(5) - 1) / 2
+        a, b = r_min, r_max
+        c, d = b - razao * (b - a), a + razao * (b - a)
+
+        wc, inicial = self.resolver_alvo(problema, c, inicial)
+        wd, inicial = self.resolver_alvo(problema, d, inicial)
+        sc, sd = self.__sharpe(problema, wc), self.__sharpe(problema, wd)
+
+        for _ in range(30):
+            if abs(b - a) <= 1e-5 * max(1.0, abs(b)):
+                break
+            if sc >= sd:
+                b, d, wd, sd = d, c, wc, sc
+                c = b - razao * (b - a)
+                wc, inicial = self.resolver_alvo(problema, c, inicial)
+                sc = self.__sharpe(problema, wc)
+            else:
+                a, c, wc, sc = c, d, wd, sd
+                d = a + razao * (b - a)
+                wd, inicial = self.resolver_alvo(problema, d, inicial)
+                sd = self.__sharpe(problema, wd)
+
+        return wc if sc >= sd else wd
+
+    def otimizar_perfis(self, retorno_medio: pd.Series, cov: pd.DataFrame,
+                        segmentos: pd.Series = None) -> dict:
+        problema = self.preparar(retorno_medio, cov, segmentos)
+        tickers = problema["tickers"]
+
+        w_min, solucao = self.resolver_alvo(problema)
+        r_min = float(w_min @ problema["mu"])
+        r_max = max(problema["retorno_maximo"], r_min)
+
+        w_moderado, _ = self.resolver_alvo(problema, r_min + 0.5 * (r_max - r_min), solucao)
+        w_arrojado = self.__max_sharpe(problema, r_min, r_min + 0.999 * (r_max - r_min), solucao)
+
+        return {
+            "conservador": pd.Series(w_min, index=tickers),
+            "moderado": pd.Series(w_moderado, index=tickers),
+            "arrojado": pd.Series(w_arrojado, index=tickers),
+        }
+
+
+    def fronteira(self, retorno_medio: pd.Series, cov: pd.DataFrame,
+                  segmentos: pd.Series = None, pontos: int = 20) -> pd.DataFrame:
+        problema = self.preparar(retorno_medio, cov, segmentos)
+        mu = problema["mu"]
+
+        w_min, solucao = self.resolver_alvo(problema)
+        r_min = float(w_min @ mu)
+        r_max = max(problema["retorno_maximo"], r_min)
+        alvos = np.linspace(r_min, r_min + 0.999 * (r_max - r_min), pontos)
+
+        # Cada ponto parte da solução do ponto anterior
+        pesos = np.empty((pontos, len(mu)))
+        for i, alvo in enumerate(alvos):
+            pesos[i], solucao = self.resolver_alvo(problema, alvo, solucao)
+
+        retornos = pesos @ mu
+        volatilidades = np.sqrt(self.__variancias(problema, pesos))
+        sharpe = np.divide(retornos - self.__taxa_livre_risco, volatilidades,
+                           out=np.zeros(pontos), where=volatilidades > 0)
+
+        df = pd.DataFrame(pesos, columns=problema["tickers"])
+        df.insert(0, "sharpe", sharpe)
+        df.insert(0, "volatilidade", volatilidades)
+        df.insert(0, "retorno", retornos)
+        return df
+
+
+class OtimizadorTercis(Otimizador):
+    """Alocação original: divide os ativos em tercis de volatilidade e dá
+    peso igual dentro de cada grupo."""
+
+    def otimizar_perfis(self, retorno_medio: pd.Series, cov: pd.DataFrame,
+                        segmentos: pd.Series = None) -> dict:
+        diagonal = cov.diagonal() if isinstance(cov, ModeloFatorial) else np.diag(cov.to_numpy())
+        volatilidade = pd.Series(np.sqrt(diagonal), index=cov.columns)
+
+        ativos_ordenados = volatilidade.sort_values().index.tolist()
+        grupos = [g.tolist() for g in np.array_split(ativos_ordenados, 3)]
+
+        logging.info(f"Grupos de risco: Safe({len(grupos[0])}), Medio({len(grupos[1])}), Risco({len(grupos[2])})")
+
+        vol_min = float(volatilidade.min())
+        vol_max = float(volatilidade.max())
+        dispersao = (vol_max - vol_min) / max(vol_max, 1e-9)
+        dispersao = max(0.2, min(dispersao, 0.8))
+
+        pesos_perfil = {
+            "conservador": [
+                max(0, 0.50 + dispersao * 0.4),
+                max(0, 0.35 - dispersao * 0.2),
+                max(0, 0.15 - dispersao * 0.2),
+            ],
+            "moderado": [0.33, 0.34, 0.33],
+            "arrojado": [
+                max(0, 0.20 - dispersao * 0.1),
+                max(0, 0.30 - dispersao * 0.2),
+                max(0, 0.50 + dispersao * 0.3),
+            ],
+        }
+
+        carteiras = {}
+        for perfil, pesos in pesos_perfil.items():
+            total = sum(pesos)
+            carteira = pd.Series(0.0, index=cov.columns)
+
+            for grupo, peso_grupo in zip(grupos, pesos):
+                if grupo:
+                    carteira[grupo] = peso_grupo / total / len(grupo)
+
+            carteiras[perfil] = carteira
+
+        return carteiras
@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+
+class PoolNavegadores:
+    """Mantém um conjunto pequeno de drivers Selenium de vida longa.
+
+    Cada driver é criado sob demanda e passa uma única vez pela função
+    `preparar` (ex.: aplicar filtros da página). Drivers que travam são
+    descartados e recriados na próxima tarefa.
+    """
+
+    def __init__(self, criar_driver, tamanho: int, preparar=None, tentativas: int = 2):
+        self.__criar_driver = criar_driver
+        self.__preparar = preparar
+        self.__tamanho = max(1, tamanho)
+        self.__tentativas = max(1, tentativas)
+        self.__livres = queue.Queue()
+        self.__ativos = []
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+    def __novo_driver(self):
+        driver = self.__criar_driver()
+
+        try:
+            if self.__preparar is not None:
+                self.__preparar(driver)
+        except Exception:
+            driver.quit()
+            raise
+
+        return driver
+
+    def __obter(self):
+        with self.__lock:
+            criar = self.__livres.empty() and len(self.__ativos) < self.__tamanho
+            if criar:
+                self.__ativos.append(None)
+
+        if not criar:
+            return self.__livres.get()
+
+        try:
+            driver = self.__novo_driver()
+        except Exception:
+            with self.__lock:
+                self.__ativos.remove(None)
+            raise
+
+        with self.__lock:
+            self.__ativos[self.__ativos.index(None)] = driver
+        return driver
+
+    def __devolver(self, driver):
+        self.__livres.put(driver)
+
+    def __descartar(self, driver):
+        with self.__lock:
+            if driver in self.__ativos:
+                self.__ativos.remove(driver)
+
+        try:
+            driver.quit()
+        except Exception:
+            ...
+
+    def executar(self, funcao, *args):
+        """Executa `funcao(driver, *args)` em um driver do pool, recriando o
+        driver se ele travar."""
+        erro = None
+
+        for tentativa in range(1, self.__tentativas + 1):
+            driver = self.__obter()
+
+            try:
+                resultado = funcao(driver, *args)
+            except TimeoutException as e:
+                # Página lenta ou pop-up: o driver continua utilizável
+                erro = e
+                self.__devolver(driver)
+            except WebDriverException as e:
+                erro = e
+                logging.warning(f"⚠️ Driver travou (tentativa {tentativa}/{self.__tentativas}), reiniciando")
+                self.__descartar(driver)
+            except Exception:
+                self.__devolver(driver)
+                raise
+            else:
+                self.__devolver(driver)
+                return resultado
+
+        raise erro
+
+    def mapear(self, funcao, itens) -> list:
+        """Aplica `funcao(driver, item)` a cada item em paralelo, um item por
+        driver. Itens que falham em todas as tentativas retornam None."""
+        def tarefa(item):
+            try:
+                return self.executar(funcao, item)
+            except Exception as e:
+                logging.error(f"❌ Falha ao processar {item}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.__tamanho) as executor:
+            return list(executor.map(tarefa, itens))
+
+    def fechar(self):
+        with self.__lock:
+            drivers = [d for d in self.__ativos if d is not None]
+            self.__ativos = []
+
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                ...
+
+        self.__livres = queue.Queue()
@@ -1,48 +1,77 @@
 from sqlalchemy import create_engine, text
 import pandas as pd
 from pypika import Table, Query
-import pandas as pd
+from io import StringIO
+from contextlib import contextmanager
+import threading
+import logging
+from config import DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE
 
 class PostgresSQL:
-    def __init__(self, db_connection):
-        self._engine = create_engine(db_connection)
-        self._connection = None
+    # Um engine (e portanto um pool de conexões) por string de conexão e
+    # configuração do pool, compartilhado por todas as instâncias do processo
+    _engines = {}
+    _engines_lock = threading.Lock()
+
+    def __init__(self, db_connection, pool_size: int = DB_POOL_SIZE,
+                 max_overflow: int = DB_POOL_MAX_OVERFLOW, pre_ping: bool = DB_POOL_PRE_PING):
+        self._engine = self.__obter_engine(db_connection, pool_size, max_overflow, pre_ping)
+
+    @classmethod
+    def __obter_engine(cls, db_connection, pool_size, max_overflow, pre_ping):
+        chave = (db_connection, pool_size, max_overflow, pre_ping)
+
+        with cls._engines_lock:
+            engine = cls._engines.get(chave)
+
+            if engine is None:
+                if any(c[0] == db_connection for c in cls._engines):
+                    logging.warning("⚠️ Novo pool de conexões para o mesmo banco com outra configuração")
+                engine = create_engine(
+                    db_connection,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_pre_ping=pre_ping,
+                    pool_recycle=DB_POOL_RECYCLE,
+                )
+                cls._engines[chave] = engine
+
+        return engine
+
+    @contextmanager
+    def sessao(self):
+        """Conexão do pool dentro de uma transação: commit ao sair do bloco,
+        rollback se ocorrer alguma exceção."""
+        with self._engine.begin() as conexao:
+            yield conexao
 
-    def __connect(self):
-        if self._connection is None:
-            self._connection = self._engine.connect()
+    def read(self, tabela: str) -> pd.DataFrame:
+        with self._engine.connect() as conexao:
+            return pd.read_sql_table(tabela, conexao, schema='public')
 
-            try:
-                self._connection.rollback()
-            except Exception:
-                ...
+    def query(self, query: str):
+        with self._engine.connect() as conexao:
+            return pd.read_sql_query(text(query), conexao)
 
-    def __disconnect(self):
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
+    def __ler_por_chaves(self, tabela: str, pk_cols: list, new_df: pd.DataFrame) -> pd.DataFrame:
+        # Busca apenas as linhas cujas chaves aparecem no lote recebido,
+        # filtrando cada coluna da chave no próprio banco
+        tb = Table(tabela)
+        query = Query.from_(tb).select("*")
+        filtros = {col: new_df[col].dropna().astype(str).unique().tolist() for col in pk_cols}
 
-    def read(self, tabela: str) -> pd.DataFrame:
-        df = None
-        try:
-            self.__connect()
-            df = pd.read_sql_table(tabela, self._connection, schema='public')
-        finally:
-            self.__disconnect()
-        return df
+        # Sem chaves no lote não há o que ler, e o PostgreSQL rejeita um
+        # IN (); o LIMIT 0 traz só as colunas da tabela
+        if not all(filtros.values()):
+            return self.query(query.limit(0).get_sql())
 
-    def query(self, query: str):
-        df = None
-        try:
-            self.__connect()
-            df = pd.read_sql_query(text(query), self._connection)
-        finally:
-            self.__disconnect()
-        return df
+        for col, valores in filtros.items():
+            query = query.where(tb[col].isin(valores))
 
+        return self.query(query.get_sql())
 
     def __comparar_dados(self, tabela: str, pk_cols: list, new_df: pd.DataFrame):
-        df_old = self.read(tabela)
+        df_old = self.__ler_por_chaves(tabela, pk_cols, new_df)
         new_df = new_df[df_old.columns].copy()
 
         for col in pk_cols:
@@ -50,72 +79,104 @@ class PostgresSQL:
                 df_old[col] = pd.to_datetime(df_old[col]).dt.strftime('%Y-%m-%d')
             else:
                 df_old[col] = df_old[col].astype(str)
-            
+
             new_df[col] = new_df[col].astype(str)
 
-        df_old["_key"] = df_old[pk_cols].agg("|".join, axis=1)
-        new_df["_key"] = new_df[pk_cols].agg("|".join, axis=1)
+        non_pk_cols = [col for col in df_old.columns if col not in pk_cols]
 
-        old_keys = set(df_old["_key"])
-        new_keys = set(new_df["_key"])
+        merged = new_df.merge(
+            df_old, on=pk_cols, how="left", suffixes=("", "_old"), indicator=True
+        )
 
         # 1️⃣ Linhas novas (presentes em new_df mas não em df_old)
-        insert = new_df[new_df["_key"].isin(new_keys - old_keys)].copy()
+        insert = merged.loc[merged["_merge"] == "left_only", new_df.columns].copy()
 
         # 2️⃣ Linhas alteradas (mesmas chaves, mas valores diferentes)
-        common_keys = old_keys & new_keys
-        old_common = df_old[df_old["_key"].isin(common_keys)].set_index("_key")
-        new_common = new_df[new_df["_key"].isin(common_keys)].set_index("_key")
-
-        if not old_common.empty and not new_common.empty:
-            old_common = old_common.sort_index()
-            new_common = new_common.sort_index()
-
-        non_pk_cols = [col for col in df_old.columns if col not in pk_cols + ["_key"]]
-        
-        
-        diff_mask = (old_common[non_pk_cols] != new_common[non_pk_cols]).any(axis=1)
-        update = new_common[diff_mask].reset_index()
-
-       
-        for df in [insert, update]:
-            df.drop(columns="_key", inplace=True, errors="ignore")
-
-        return insert, update
+        comuns = merged[merged["_merge"] == "both"]
+        novos = comuns[non_pk_cols].copy()
+        antigos = comuns[[f"{col}_old" for col in non_pk_cols]].set_axis(non_pk_cols, axis=1)
 
+        for col in non_pk_cols:
+            if pd.api.types.is_numeric_dtype(antigos[col]):
+                novos[col] = pd.to_numeric(novos[col], errors="coerce")
 
-    def __insert(self,tabela: Table, df: pd.DataFrame):
-        self.__connect()
-        for _, row in df.iterrows():
-            query = Query.into(tabela).columns(*row.index).insert(*row.values)
-            sql_statement = str(query)
-            self._connection.execute(text(sql_statement))
+        diff_mask = (novos.ne(antigos) & ~(novos.isna() & antigos.isna())).any(axis=1)
+        update = comuns.loc[diff_mask, new_df.columns].copy()
 
-        self._connection.commit()
-        self.__disconnect()
+        return insert.reset_index(drop=True), update.reset_index(drop=True)
 
-    def __update(self, tabela: Table, df: pd.DataFrame, pk_cols:list):
-        self.__connect()
+    def __identificador(self, nome: str) -> str:
+        return '"' + str(nome).replace('"', '""') + '"'
 
-        for _, row in df.iterrows():
-            q = Query.update(tabela)
-            for col in row.index:
-                if col not in pk_cols:
-                    q = q.set(tabela[col], row[col])
-            
-            for col in pk_cols:
-                q = q.where(tabela[col] == row[col])
+    def __preparar_lote(self, conexao, tabela: str, df: pd.DataFrame, lote: str):
+        # Cria uma tabela temporária com a mesma estrutura da tabela destino
+        # e carrega o DataFrame inteiro de uma vez via COPY
+        colunas = ", ".join(self.__identificador(col) for col in df.columns)
+        conexao.execute(text(
+            f"CREATE TEMP TABLE {self.__identificador(lote)} "
+            f"(LIKE public.{self.__identificador(tabela)} INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
 
-            sql_statement = str(q)
-            self._connection.execute(text(sql_statement))
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, header=False, na_rep="\\N")
+        buffer.seek(0)
 
-        self._connection.commit()
-        self.__disconnect()
+        cursor = conexao.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {self.__identificador(lote)} ({colunas}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    def __insert(self, conexao, tabela: str, df: pd.DataFrame):
+        if df.empty:
+            return
+
+        lote = f"_novos_{tabela.lower()}"
+        self.__preparar_lote(conexao, tabela, df, lote)
+
+        colunas = ", ".join(self.__identificador(col) for col in df.columns)
+        conexao.execute(text(
+            f"INSERT INTO public.{self.__identificador(tabela)} ({colunas}) "
+            f"SELECT {colunas} FROM {self.__identificador(lote)}"
+        ))
+
+    def __update(self, conexao, tabela: str, df: pd.DataFrame, pk_cols: list):
+        if df.empty:
+            return
+
+        non_pk_cols = [col for col in df.columns if col not in pk_cols]
+        if not non_pk_cols:
+            return
+
+        lote = f"_alterados_{tabela.lower()}"
+        self.__preparar_lote(conexao, tabela, df, lote)
+
+        set_sql = ", ".join(
+            f"{self.__identificador(col)} = s.{self.__identificador(col)}" for col in non_pk_cols
+        )
+        where_sql = " AND ".join(
+            f"t.{self.__identificador(col)} = s.{self.__identificador(col)}" for col in pk_cols
+        )
+        conexao.execute(text(
+            f"UPDATE public.{self.__identificador(tabela)} AS t SET {set_sql} "
+            f"FROM {self.__identificador(lote)} AS s WHERE {where_sql}"
+        ))
 
     def sincronizar(self, tabela: str, new_df: pd.DataFrame, pk_cols: list):
+        if new_df is None or new_df.empty:
+            logging.info(f"✅ {tabela}: nada a sincronizar")
+            return
+
         insert_df, update_df = self.__comparar_dados(tabela, pk_cols, new_df)
-        tabela = Table(tabela)
 
-        self.__insert(tabela, insert_df)
-        self.__update(tabela, update_df, pk_cols)
+        # Inserções e atualizações são aplicadas em lote, uma instrução por
+        # operação, dentro de uma única transação
+        with self.sessao() as conexao:
+            self.__insert(conexao, tabela, insert_df)
+            self.__update(conexao, tabela, update_df, pk_cols)
+
+        logging.info(f"✅ {tabela}: {len(insert_df)} inseridos, {len(update_df)} atualizados")
               
\ No newline at end of file
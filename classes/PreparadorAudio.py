@@ -0,0 +1,149 @@
+import logging
+import os
+import subprocess
+import numpy as np
+from config import DIRETORIO_AUDIO_PCM, VAD_MARGEM_DB, VAD_VARIACAO_MINIMA
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+TAXA_AMOSTRAGEM = 16000
+
+
+class PreparadorAudio:
+    """Converte o áudio baixado para PCM 16 kHz mono (int16) uma única vez
+    e remove silêncio e música por detecção de atividade de voz baseada em
+    energia.
+
+    O áudio recortado fica em `<id>.npy` e é aberto com memory-map, então a
+    transcrição não decodifica o arquivo de novo nem carrega o áudio
+    inteiro na memória. `<id>.voz.npy` guarda os intervalos mantidos, em
+    amostras do original, para que os tempos da transcrição voltem a ser
+    os do vídeo.
+    """
+
+    def __init__(self, diretorio: str = DIRETORIO_AUDIO_PCM, margem_db: float = VAD_MARGEM_DB,
+                 quadro_s: float = 0.03, folga_s: float = 0.3, pausa_minima_s: float = 1.0,
+                 janela_musica_s: float = 1.5, variacao_minima: float = VAD_VARIACAO_MINIMA):
+        self.__diretorio = diretorio
+        self.__margem_db = margem_db
+        self.__quadro = int(quadro_s * TAXA_AMOSTRAGEM)
+        self.__folga = int(round(folga_s / quadro_s))
+        self.__pausa_minima = int(round(pausa_minima_s / quadro_s))
+        self.__janela_musica = max(1, int(round(janela_musica_s / quadro_s)))
+        self.__variacao_minima = variacao_minima
+
+    def __decodificar(self, caminho: str) -> np.ndarray:
+        comando = [
+            "ffmpeg", "-nostdin", "-threads", "0", "-i", caminho,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(TAXA_AMOSTRAGEM), "-",
+        ]
+        saida = subprocess.run(comando, capture_output=True, check=True).stdout
+        return np.frombuffer(saida, dtype=np.int16)
+
+    def __musica(self, energia: np.ndarray) -> np.ndarray:
+        # A fala alterna sílabas e pausas curtas, então em cada janela de
+        # ~1,5 s boa parte dos quadros fica bem abaixo da energia média. Em
+        # música (e outros sons contínuos) a energia quase não oscila. A
+        # janela conta como música se menos de `variacao_minima` dos
+        # quadros estiver abaixo da metade da média
+        n = len(energia) // self.__janela_musica * self.__janela_musica
+        if n == 0:
+            return np.zeros(len(energia), dtype=bool)
+
+        janelas = energia[:n].reshape(-1, self.__janela_musica)
+        baixos = np.mean(janelas < 0.5 * janelas.mean(axis=1, keepdims=True), axis=1)
+
+        musica = np.repeat(baixos < self.__variacao_minima, self.__janela_musica)
+        return np.r_[musica, np.full(len(energia) - n, musica[-1])]
+
+    def __quadros_voz(self, audio: np.ndarray) -> np.ndarray:
+        n = len(audio) // self.__quadro
+        if n == 0:
+            return np.ones(1, dtype=bool)
+
+        quadros = audio[:n * self.__quadro].astype(np.float32).reshape(n, self.__quadro)
+        energia = np.mean(quadros ** 2, axis=1)
+        energia_db = 10 * np.log10(energia + 1e-10)
+
+        # O limiar fica `margem_db` acima do ruído de fundo, mas nunca a
+        # mais de 25 dB abaixo da fala forte, para não cortar sílabas fracas
+        ruido, forte = np.percentile(energia_db, [10, 95])
+        voz = (energia_db > min(ruido + self.__margem_db, forte - 25)) & ~self.__musica(energia)
+
+        # Folga em torno da fala e pausas curtas mantidas
+        if self.__folga:
+            nucleo = np.ones(2 * self.__folga + 1)
+            voz = np.convolve(voz, nucleo, mode="same") > 0
+
+        mudancas = np.flatnonzero(np.diff(np.r_[0, voz.astype(np.int8), 0]))
+        inicios, fins = mudancas[::2], mudancas[1::2]
+        for fim, proximo in zip(fins[:-1], inicios[1:]):
+            if proximo - fim < self.__pausa_minima:
+                voz[fim:proximo] = True
+
+        return voz
+
+    def __intervalos_voz(self, audio: np.ndarray) -> np.ndarray:
+        voz = self.__quadros_voz(audio)
+        mudancas = np.flatnonzero(np.diff(np.r_[0, voz.astype(np.int8), 0]))
+        inicios = mudancas[::2] * self.__quadro
+        fins = np.minimum(mudancas[1::2] * self.__quadro, len(audio))
+
+        if len(inicios) == 0:
+            return np.array([[0, len(audio)]], dtype=np.int64)
+
+        # O resto da divisão em quadros acompanha o último trecho
+        if fins[-1] >= (len(audio) // self.__quadro) * self.__quadro:
+            fins[-1] = len(audio)
+
+        return np.column_stack([inicios, fins]).astype(np.int64)
+
+    def preparar(self, caminho: str) -> tuple:
+        """Retorna (áudio int16 em memory-map, trechos)."""
+        nome = os.path.splitext(os.path.basename(caminho))[0]
+        caminho_pcm = os.path.join(self.__diretorio, nome + ".npy")
+        caminho_voz = os.path.join(self.__diretorio, nome + ".voz.npy")
+
+        if (not os.path.exists(caminho_pcm) or not os.path.exists(caminho_voz)
+                or os.path.getmtime(caminho_pcm) < os.path.getmtime(caminho)
+                or os.path.getmtime(caminho_voz) < os.path.getmtime(caminho_pcm)):
+            audio = self.__decodificar(caminho)
+            intervalos = self.__intervalos_voz(audio)
+            recortado = np.concatenate([audio[a:b] for a, b in intervalos])
+
+            # Os intervalos são gravados depois do PCM; se a gravação for
+            # interrompida entre os dois, os intervalos ficam mais antigos
+            # que o PCM e o arquivo é preparado de novo
+            os.makedirs(self.__diretorio, exist_ok=True)
+            for destino, dados in [(caminho_pcm, recortado), (caminho_voz, intervalos)]:
+                temporario = destino + ".tmp"
+                with open(temporario, "wb") as f:
+                    np.save(f, dados)
+                os.replace(temporario, destino)
+
+            # Formato anterior, com os trechos em segundos
+            antigo = os.path.join(self.__diretorio, nome + ".trechos.npy")
+            if os.path.exists(antigo):
+                os.remove(antigo)
+
+            logging.info(
+                f"🔈 {nome}: {os.path.getsize(caminho) / 1024 ** 2:.1f} MB → "
+                f"{recortado.nbytes / 1024 ** 2:.1f} MB PCM, "
+                f"{1 - len(recortado) / max(len(audio), 1):.0%} do áudio removido como silêncio ou música"
+            )
+
+        intervalos = np.load(caminho_voz)
+        posicoes = np.r_[0, np.cumsum(intervalos[:, 1] - intervalos[:, 0])[:-1]]
+        trechos = np.column_stack([intervalos[:, 0], posicoes]) / TAXA_AMOSTRAGEM
+
+        return np.load(caminho_pcm, mmap_mode="r"), trechos
+
+    @staticmethod
+    def tempo_original(tempos, trechos: np.ndarray) -> np.ndarray:
+        """Converte tempos do áudio recortado para tempos do áudio original."""
+        tempos = np.asarray(tempos, dtype=float)
+        indices = np.searchsorted(trechos[:, 1], tempos, side="right") - 1
+        indices = np.clip(indices, 0, len(trechos) - 1)
+        return trechos[indices, 0] + tempos - trechos[indices, 1]
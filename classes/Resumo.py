@@ -1,58 +1,226 @@
-import requests
 from classes.Video import Video
-from config import DIRETORIO_RESUMO, RESUMO_GERAL
+from classes.ClienteLLM import ClienteLLM, ErroLLM
+from classes.CacheDisco import CacheDisco
+from config import DIRETORIO_RESUMO, RESUMO_GERAL, RESUMO_TOKENS_BLOCO
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
 import logging
 
-logging.basicConfig(level=logging.INFO, 
+logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s',
                     datefmt='%d-%m-%Y %H:%M:%S')
 
+# Estimativa grosseira usada para dividir os textos pelo orçamento de tokens
+CARACTERES_POR_TOKEN = 4
+
 class Resumo():
 
-    def __gerador_resumo(self, transcricao, arquivo_resumo):
-        resposta = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                "model" : "llama3.2:latest",
-                "prompt" :f"Resuma o seguinte conteúdo de maneira clara e objetiva. Foque nos principais insights sobre o cenário econômico e nos setores de investimento mencionados no texto.\n\n{transcricao}",
-                "system" : "Você é um analista de investimentos sênior. Seu objetivo é extrair a essência de um texto para uma análise de portfólio posterior. Seja conciso e direto ao ponto.",
-                "stream" : False
-            }
-        )
+    __SYSTEM = "Você é um analista de investimentos sênior. Seu objetivo é extrair a essência de um texto para uma análise de portfólio posterior. Seja conciso e direto ao ponto."
+    __PROMPT_MAP = "Resuma o seguinte conteúdo de maneira clara e objetiva. Foque nos principais insights sobre o cenário econômico e nos setores de investimento mencionados no texto.\n\n{texto}"
+    __PROMPT_REDUCE = "Combine os resumos a seguir em um único resumo claro e objetivo, sem repetir informações. Preserve os principais insights sobre o cenário econômico e os setores de investimento mencionados.\n\n{texto}"
+
+    def __init__(self, llm: ClienteLLM = None, cache: CacheDisco = None,
+                 tokens_bloco: int = RESUMO_TOKENS_BLOCO):
+        self.__llm = llm or ClienteLLM()
+        self.__cache = cache or CacheDisco()
+        self.__limite = tokens_bloco * CARACTERES_POR_TOKEN
+        self.__antecipacao = ThreadPoolExecutor(max_workers=1)
+        # Hash dos blocos já enviados para o resumo antecipado
+        self.__antecipados = set()
+        self.__encerrando = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+    def fechar(self):
+        """Descarta os resumos antecipados ainda na fila e espera o bloco em
+        andamento terminar."""
+        self.__encerrando.set()
+        self.__antecipacao.shutdown(wait=True, cancel_futures=True)
+
+    def __dividir(self, texto: str) -> list:
+        # Quebra nas linhas para não cortar frases; linhas maiores que o
+        # limite (transcrições do Whisper costumam ser uma linha só) são
+        # cortadas no último espaço antes do limite
+        blocos, atual = [], []
+        tamanho = 0
+
+        for linha in texto.splitlines():
+            while len(linha) > self.__limite:
+                corte = linha.rfind(" ", 0, self.__limite)
+                corte = corte if corte > 0 else self.__limite
+                blocos.append(linha[:corte])
+                linha = linha[corte:].lstrip()
+
+            if tamanho + len(linha) > self.__limite and atual:
+                blocos.append("\n".join(atual))
+                atual, tamanho = [], 0
+
+            atual.append(linha)
+            tamanho += len(linha) + 1
+
+        if atual and "".join(atual).strip():
+            blocos.append("\n".join(atual))
+
+        return [b for b in blocos if b.strip()]
 
-        if resposta.status_code == 200:
-          resumo = resposta.json()['response']
+    def __agrupar(self, resumos: list) -> list:
+        grupos, atual = [], []
+        tamanho = 0
+
+        for resumo in resumos:
+            # Cada grupo tem ao menos dois resumos, garantindo que a redução avance
+            if tamanho + len(resumo) > self.__limite and len(atual) > 1:
+                grupos.append("\n\n".join(atual))
+                atual, tamanho = [], 0
+            atual.append(resumo)
+            tamanho += len(resumo) + 2
+
+        if atual:
+            grupos.append("\n\n".join(atual))
+
+        return grupos
+
+    def __gerar_lote(self, prompt: str, textos: list) -> list:
+        respostas = self.__llm.gerar_lote([prompt.format(texto=t) for t in textos], system=self.__SYSTEM)
+
+        if any(r is None for r in respostas):
+            raise ErroLLM(f"{sum(r is None for r in respostas)} de {len(respostas)} blocos sem resposta")
+
+        return respostas
+
+    def __reduzir(self, resumos: list) -> str:
+        # Redução hierárquica: junta os resumos em grupos que cabem no
+        # orçamento e resume cada grupo, até restar um único resumo
+        if not resumos:
+            raise ErroLLM("Nenhum conteúdo para resumir")
+
+        while len(resumos) > 1:
+            resumos = self.__gerar_lote(self.__PROMPT_REDUCE, self.__agrupar(resumos))
+            logging.info(f"🔄️ Redução: {len(resumos)} resumo(s) restante(s)")
+
+        return resumos[0]
+
+    def __resumir(self, texto: str) -> str:
+        blocos = self.__dividir(texto)
+        if not blocos:
+            raise ErroLLM("Texto vazio")
+
+        return self.__reduzir(self.__gerar_lote(self.__PROMPT_MAP, blocos))
+
+    def __gerador_resumo(self, transcricao, arquivo_resumo):
+        try:
+            resumo = self.__resumir(transcricao)
+        except ErroLLM as e:
+            logging.error(f"❌ Erro na resposta da API: {e}")
+            return False
 
-          with open(arquivo_resumo, 'w', encoding="utf-8") as file:
+        with open(arquivo_resumo, 'w', encoding="utf-8") as file:
             file.write(resumo)
 
-        else:
-            logging.error(f"❌ Erro na resposta da API: {resposta.status_code} \nCorpo da resposda: {resposta.text}")
+        return True
 
-    def resumir_video(self, url: str):
-        video = Video(url)
-        video.transcrever()
-    
+    def __resumir_blocos(self, blocos: list):
+        for bloco in blocos:
+            if self.__encerrando.is_set():
+                return
+            try:
+                self.__llm.gerar(self.__PROMPT_MAP.format(texto=bloco), system=self.__SYSTEM)
+            except ErroLLM as e:
+                logging.warning(f"⚠️ Resumo antecipado interrompido: {e}")
+                return
+
+    def antecipar(self, texto_parcial: str):
+        """Começa, em segundo plano, a etapa map do resumo de uma transcrição
+        ainda em andamento. A divisão em blocos é sequencial, então todos os
+        blocos do texto parcial menos o último são idênticos aos do texto
+        final, e suas respostas ficam no cache do cliente para quando o
+        resumo completo for gerado. Cada bloco é enviado uma única vez."""
+        novos = []
+        for bloco in self.__dividir(texto_parcial)[:-1]:
+            chave = hashlib.sha256(bloco.encode("utf-8")).hexdigest()
+            if chave not in self.__antecipados:
+                self.__antecipados.add(chave)
+                novos.append(bloco)
+
+        if novos and not self.__encerrando.is_set():
+            self.__antecipacao.submit(self.__resumir_blocos, novos)
+
+    def resumir_transcricao(self, video: Video) -> bool:
         with open(video.get_transcricao_audio, 'r', encoding="utf-8") as arquivo:
             transcricao = arquivo.read()
 
         arquivo_resumo = DIRETORIO_RESUMO + '\\' + video.get_id_video + ".txt"
-        print(f"Endereço arquivi: {arquivo_resumo}")
 
-        logging.info('🔄️ Gerando Resumo')
-        self.__gerador_resumo(transcricao,arquivo_resumo)
-        logging.info('✅ Resumo gerado')
+        logging.info(f'🔄️ Gerando Resumo de {video.get_id_video}')
+        return self.__gerador_resumo(transcricao,arquivo_resumo)
+
+    def resumir_video(self, url: str):
+        video = Video(url)
+        video.transcrever()
+
+        if self.resumir_transcricao(video):
+            logging.info('✅ Resumo gerado')
+
+    def __resumos_arquivos(self, caminhos: list) -> list:
+        # Cada arquivo tem seu resumo parcial guardado pelo hash do conteúdo;
+        # só os arquivos novos ou alterados voltam para o modelo
+        conteudos, chaves, parciais = [], [], []
+
+        for caminho in caminhos:
+            with open(caminho, 'r', encoding="utf-8") as arquivo:
+                conteudo = arquivo.read()
+
+            chave = CacheDisco.chave(self.__llm.modelo, hashlib.sha256(conteudo.encode("utf-8")).hexdigest())
+            parcial = self.__cache.obter("resumos", chave)
+
+            conteudos.append(conteudo)
+            chaves.append(chave)
+            parciais.append(None if parcial is None else parcial.decode("utf-8"))
+
+        pendentes = [i for i, p in enumerate(parciais) if p is None]
+        logging.info(f"❕ {len(caminhos) - len(pendentes)} resumos reaproveitados, {len(pendentes)} a gerar")
+
+        # Map: os blocos de todos os arquivos pendentes vão juntos para o
+        # modelo, aproveitando a concorrência do cliente
+        blocos = {i: self.__dividir(conteudos[i]) for i in pendentes}
+        respostas = iter(self.__gerar_lote(self.__PROMPT_MAP, [b for i in pendentes for b in blocos[i]]))
+
+        for i in pendentes:
+            resumos_blocos = [next(respostas) for _ in blocos[i]]
+            if not resumos_blocos:
+                continue
+
+            parciais[i] = self.__reduzir(resumos_blocos)
+            self.__cache.salvar("resumos", chaves[i], parciais[i].encode("utf-8"))
+
+        return [p for p in parciais if p]
 
     def resumir_diretorio(self):
-        conteudo = ""
-        
-        for nome_arquivo in os.listdir(DIRETORIO_RESUMO):
-           caminho_arquivo = os.path.join(DIRETORIO_RESUMO, nome_arquivo)
+        caminhos = sorted(
+            os.path.join(DIRETORIO_RESUMO, nome) for nome in os.listdir(DIRETORIO_RESUMO)
+            if os.path.join(DIRETORIO_RESUMO, nome) != RESUMO_GERAL
+            and os.path.isfile(os.path.join(DIRETORIO_RESUMO, nome))
+        )
+
+        if not caminhos:
+            logging.warning("⚠️ Nenhum resumo encontrado para consolidar")
+            return
 
-           with open(caminho_arquivo, 'r', encoding="utf-8") as arquivo:
-            conteudo += arquivo.read() + '\n'
+        logging.info(f"🔄️ Consolidando {len(caminhos)} resumos")
+
+        try:
+            resumo = self.__reduzir(self.__resumos_arquivos(caminhos))
+        except ErroLLM as e:
+            logging.error(f"❌ Erro na resposta da API: {e}")
+            return
+
+        with open(RESUMO_GERAL, 'w', encoding="utf-8") as file:
+            file.write(resumo)
 
-        self.__gerador_resumo(conteudo, RESUMO_GERAL)
-        
-        
\ No newline at end of file
+        logging.info('✅ Resumo geral gerado')
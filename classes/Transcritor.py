@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import whisper
+from config import WHISPER_MODELO, WHISPER_WORKERS, WHISPER_THREADS, WHISPER_SEGMENTO_S
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    datefmt='%d-%m-%Y %H:%M:%S')
+
+TAXA_AMOSTRAGEM = whisper.audio.SAMPLE_RATE
+
+# Modelos já carregados neste processo, por tamanho
+_modelos = {}
+
+
+def _modelo(tamanho: str):
+    if tamanho not in _modelos:
+        logging.info(f"🔄️ Carregando modelo Whisper '{tamanho}'")
+        _modelos[tamanho] = whisper.load_model(tamanho)
+    return _modelos[tamanho]
+
+
+def _inicializar(tamanho: str, threads: int):
+    # Executada uma vez em cada processo do pool: fixa as threads do torch e
+    # deixa o modelo carregado para todos os segmentos que o processo receber
+    import torch
+    torch.set_num_threads(threads)
+    _modelo(tamanho)
+
+
+def _transcrever_segmento(tarefa: tuple) -> list:
+    tamanho, audio, inicio = tarefa
+    resposta = _modelo(tamanho).transcribe(audio, fp16=False)
+
+    return [
+        (inicio + s["start"], inicio + s["end"], s["text"].strip())
+        for s in resposta["segments"] if s["text"].strip()
+    ]
+
+
+class Transcritor:
+    """Transcrição com Whisper em um pool de processos.
+
+    Cada processo carrega o modelo uma única vez e o mantém entre vídeos.
+    Áudios longos são divididos em segmentos de `duracao_segmento`
+    segundos (cortados no trecho mais silencioso perto do limite, para não
+    partir palavras), transcritos em paralelo e reunidos com os tempos
+    relativos ao início do áudio.
+    """
+
+    _padrao = None
+    _lock = threading.Lock()
+
+    def __init__(self, modelo: str = WHISPER_MODELO, workers: int = WHISPER_WORKERS,
+                 threads: int = WHISPER_THREADS, duracao_segmento: float = WHISPER_SEGMENTO_S):
+        self.__modelo = modelo
+        self.__workers = max(1, workers)
+        self.__threads = max(1, threads)
+        self.__amostras_segmento = max(TAXA_AMOSTRAGEM, int(duracao_segmento * TAXA_AMOSTRAGEM))
+        self.__executor = None
+
+    @classmethod
+    def padrao(cls) -> "Transcritor":
+        """Instância compartilhada, para que o pool e os modelos carregados
+        sejam reaproveitados entre vídeos."""
+        with cls._lock:
+            if cls._padrao is None:
+                cls._padrao = cls()
+            return cls._padrao
+
+    def __pool(self) -> ProcessPoolExecutor:
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.__workers, initializer=_inicializar,
+                initargs=(self.__modelo, self.__threads)
+            )
+        return self.__executor
+
+    def __cortes(self, audio: np.ndarray, inicio: int = 0) -> list:
+        # Procura, nos últimos 10 s de cada segmento (ou na metade final, se
+        # o segmento for curto), a janela de 0,5 s com menor energia e corta
+        # ali. Como a busca nunca passa da metade do segmento, cada corte
+        # avança pelo menos meio segmento
+        janela = TAXA_AMOSTRAGEM // 2
+        busca = min(10 * TAXA_AMOSTRAGEM, self.__amostras_segmento // 2)
+        cortes = [inicio]
+
+        if inicio >= len(audio):
+            return cortes
+
+        while len(audio) - cortes[-1] > self.__amostras_segmento:
+            fim = cortes[-1] + self.__amostras_segmento
+            trecho = np.asarray(audio[fim - busca:fim], dtype=np.float32)
+            energia = np.square(trecho[:len(trecho) // janela * janela]).reshape(-1, janela).sum(axis=1)
+            corte = fim - busca + int(np.argmin(energia)) * janela
+            assert corte > cortes[-1], f"corte em {corte} não avança além de {cortes[-1]}"
+            cortes.append(corte)
+
+        cortes.append(len(audio))
+        return cortes
+
+    @staticmethod
+    def __float32(audio: np.ndarray) -> np.ndarray:
+        # O PCM preparado é int16 (e pode estar em memory-map); só o
+        # segmento enviado ao processo é convertido
+        if audio.dtype == np.int16:
+            return audio.astype(np.float32) / 32768.0
+        return np.asarray(audio, dtype=np.float32)
+
+    def __mapear(self, tarefas):
+        # Mantém no máximo dois segmentos por processo enviados ao pool; os
+        # seguintes só são convertidos para float32 e serializados quando um
+        # resultado é entregue, então a memória não cresce com o áudio
+        pool = self.__pool()
+        pendentes = deque()
+
+        try:
+            for tarefa in tarefas:
+                pendentes.append(pool.submit(_transcrever_segmento, tarefa))
+                if len(pendentes) >= 2 * self.__workers:
+                    yield pendentes.popleft().result()
+
+            while pendentes:
+                yield pendentes.popleft().result()
+        finally:
+            for futuro in pendentes:
+                futuro.cancel()
+
+    def iterar(self, audio, inicio: int = 0):
+        """Transcreve a partir da amostra `inicio` e entrega, em ordem, um
+        par (amostra final, segmentos) a cada segmento concluído. Os
+        segmentos seguintes continuam sendo processados no pool enquanto o
+        chamador grava os anteriores."""
+        inicio_execucao = time.perf_counter()
+
+        if isinstance(audio, str):
+            audio = whisper.load_audio(audio)
+
+        cortes = self.__cortes(audio, inicio)
+        tarefas = (
+            (self.__modelo, self.__float32(audio[a:b]), a / TAXA_AMOSTRAGEM)
+            for a, b in zip(cortes[:-1], cortes[1:])
+        )
+
+        if self.__workers == 1:
+            _inicializar(self.__modelo, self.__threads)
+            partes = map(_transcrever_segmento, tarefas)
+        else:
+            partes = self.__mapear(tarefas)
+
+        yield from zip(cortes[1:], partes)
+
+        duracao = (len(audio) - inicio) / TAXA_AMOSTRAGEM
+        decorrido = time.perf_counter() - inicio_execucao
+        logging.info(
+            f"🎙️ {duracao / 60:.1f} min de áudio transcritos em {decorrido:.1f}s "
+            f"({len(cortes) - 1} segmentos, {duracao / max(decorrido, 1e-9):.1f}x tempo real)"
+        )
+
+    def transcrever(self, audio) -> list:
+        """`audio` é o caminho de um arquivo ou um array a 16 kHz (float32
+        ou int16). Retorna a lista de (início, fim, texto) em segundos."""
+        return [s for _, segmentos in self.iterar(audio) for s in segmentos]
+
+    @staticmethod
+    def formatar(segmentos: list) -> str:
+        linhas = []
+        for inicio, _, texto in segmentos:
+            horas, resto = divmod(int(inicio), 3600)
+            minutos, segundos = divmod(resto, 60)
+            linhas.append(f"[{horas:02d}:{minutos:02d}:{segundos:02d}] {texto}")
+        return "\n".join(linhas)
+
+    def fechar(self):
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
@@ -1,14 +1,22 @@
 import yt_dlp
+import json
 import os
-import whisper
 import re
+from classes.Transcritor import Transcritor
+from classes.PreparadorAudio import PreparadorAudio
 from config import DIRETORIO_TRANSCRICAO, DIRETORIO_AUDIO
 
 class Video:
     def __init__(self, url:str):
         self.__url = url
         self.__id_video = self.__extrair_video_id()
-        self.__audio_path = self.__transcricao_audio = None
+        self.__audio_path = DIRETORIO_AUDIO + "\\" + self.__id_video + ".flac"
+
+        # Áudios antigos foram baixados em MP3
+        if os.path.exists(DIRETORIO_AUDIO + "\\" + self.__id_video + ".mp3"):
+            self.__audio_path = DIRETORIO_AUDIO + "\\" + self.__id_video + ".mp3"
+
+        self.__transcricao_audio = DIRETORIO_TRANSCRICAO + '\\' +  self.__id_video + ".txt"
 
     def __extrair_video_id(self):
         match = re.search(r"v=([a-zA-Z0-9_-]+)", self.__url)
@@ -17,10 +25,29 @@ class Video:
         else:
             raise ValueError("Não foi possível extrair o ID do vídeo da URL fornecida.")
 
+    @staticmethod
+    def expandir(url: str) -> list:
+        """Retorna as URLs dos vídeos de uma playlist (ou a própria URL,
+        se for um vídeo), sem baixar nada."""
+        configuracoes = {"extract_flat": "in_playlist", "quiet": True, "skip_download": True}
+
+        with yt_dlp.YoutubeDL(configuracoes) as ydl:
+            info = ydl.extract_info(url, download=False)
+
+        entradas = info.get("entries")
+        if entradas is None:
+            return [f"https://www.youtube.com/watch?v={info['id']}"]
+
+        return [f"https://www.youtube.com/watch?v={e['id']}" for e in entradas if e and e.get("id")]
+
     @property
     def get_id_video(self):
         return self.__id_video
 
+    @property
+    def get_audio(self):
+        return self.__audio_path
+
     @property
     def get_transcricao_audio(self):
         return self.__transcricao_audio
@@ -28,34 +55,91 @@ class Video:
     def __baixar_video(self):
 
         configuracoes = {
-            "outtmpl": os.path.join(DIRETORIO_AUDIO, f"{self.__id_video}.%(ext)s"), 
+            "outtmpl": os.path.join(DIRETORIO_AUDIO, f"{self.__id_video}.%(ext)s"),
             "format": "bestaudio/best",
+            # Já no formato que o Whisper usa: 16 kHz mono, sem perdas
             "postprocessors": [
                 {
                     "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
+                    "preferredcodec": "flac",
                 }
             ],
+            "postprocessor_args": {"extractaudio": ["-ar", "16000", "-ac", "1"]},
         }
 
         # Use extract_info para obter informações do vídeo
         with yt_dlp.YoutubeDL(configuracoes) as ydl:
             ydl.extract_info(self.__url, download=True)  # Obtém informações do vídeo e baixa o áudio
 
-        self.__audio_path = DIRETORIO_AUDIO + "\\" + self.__id_video + ".mp3"
-        self.__transcricao_audio = DIRETORIO_TRANSCRICAO + '\\' +  self.__id_video + ".txt"
+    def baixar(self):
+        if not os.path.exists(self.__audio_path):
+            self.__baixar_video()
+
+    def __ler_progresso(self, caminho: str, amostras: int) -> tuple:
+        # Checkpoint de uma transcrição interrompida: última amostra concluída
+        # e tamanho do arquivo de transcrição naquele momento. Só vale se o
+        # áudio preparado ainda for o mesmo
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                progresso = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0, 0
+
+        if progresso.get("amostras") != amostras or not os.path.exists(self.__transcricao_audio):
+            return 0, 0
+
+        return progresso["amostra"], progresso["tamanho"]
+
+    def __gravar_progresso(self, caminho: str, amostra: int, tamanho: int, amostras: int):
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"amostra": int(amostra), "tamanho": tamanho, "amostras": amostras}, f)
+        os.replace(temporario, caminho)
+
+    def transcrever(self, transcritor: Transcritor = None, preparador: PreparadorAudio = None,
+                    ao_avancar=None):
+        """Transcreve em segmentos, acrescentando cada um ao arquivo de
+        transcrição assim que fica pronto. Uma execução interrompida
+        continua do último segmento gravado. `ao_avancar`, se informado,
+        recebe o texto transcrito até o momento a cada segmento."""
+        self.baixar()
+
+        if not os.path.exists(self.__audio_path):
+            raise FileNotFoundError(f"Áudio de {self.__id_video} não encontrado: {self.__audio_path}")
+
+        transcritor = transcritor or Transcritor.padrao()
+        preparador = preparador or PreparadorAudio()
+
+        audio, trechos = preparador.preparar(self.__audio_path)
+        caminho_progresso = self.__transcricao_audio + ".progresso"
+        inicio, tamanho = self.__ler_progresso(caminho_progresso, len(audio))
+
+        with open(self.__transcricao_audio, "r+b" if inicio else "wb") as arquivo:
+            arquivo.truncate(tamanho)
+            arquivo.seek(tamanho)
+
+            if inicio:
+                arquivo.seek(0)
+                texto = arquivo.read().decode("utf-8")
+            else:
+                texto = ""
+
+            for fim, segmentos in transcritor.iterar(audio, inicio):
+                inicios = PreparadorAudio.tempo_original([s[0] for s in segmentos], trechos)
+                fins = PreparadorAudio.tempo_original([s[1] for s in segmentos], trechos)
+                trecho = Transcritor.formatar(list(zip(inicios, fins, [s[2] for s in segmentos])))
 
-    def transcrever(self):
-        self.__baixar_video()
-        
-        if not self.__audio_path or not os.path.exists(self.__audio_path):
-            return
+                if trecho:
+                    trecho = ("\n" if texto else "") + trecho
+                    arquivo.write(trecho.encode("utf-8"))
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+                    texto += trecho
 
-        modelo = whisper.load_model("base")
+                self.__gravar_progresso(caminho_progresso, fim, arquivo.tell(), len(audio))
 
-        resposta = modelo.transcribe(self.__audio_path)
-        transcricao =  resposta["text"]
+                if ao_avancar is not None:
+                    ao_avancar(texto)
 
-        with open(self.__transcricao_audio, 'w', encoding="utf-8") as arquivo:
-            arquivo.write(transcricao)
+        if os.path.exists(caminho_progresso):
+            os.remove(caminho_progresso)
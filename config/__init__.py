@@ -12,5 +12,91 @@ DIRETORIO_AUDIO = DIRETORIO_PROJETO + "\\audios"
 ARQUIVO_BAIXADOS = DIRETORIO_PROJETO + "\\doc\\videos_baixados.txt"
 FOLDER = DIRETORIO_PROJETO + "\\Dados"
 RESUMO_GERAL = DIRETORIO_RESUMO + "\\Resumo Geral.txt"
+DIRETORIO_CACHE = DIRETORIO_PROJETO + "\\cache"
+DIRETORIO_PRECOS = DIRETORIO_PROJETO + "\\precos"
+DIRETORIO_AUDIO_PCM = DIRETORIO_CACHE + "\\audio"
 
 DB_CONNECTION_STRING  = os.getenv('DB_CONNECTION_STRING')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+
+YAHOO_LOTE = int(os.getenv('YAHOO_LOTE', 50))
+YAHOO_THREADS = int(os.getenv('YAHOO_THREADS', 8))
+YAHOO_TENTATIVAS = int(os.getenv('YAHOO_TENTATIVAS', 3))
+YAHOO_BACKOFF = float(os.getenv('YAHOO_BACKOFF', 2))
+
+JANELA_PRECOS_DIAS = int(os.getenv('JANELA_PRECOS_DIAS', 90))
+JANELA_BACKFILL_DIAS = int(os.getenv('JANELA_BACKFILL_DIAS', 365 * 5))
+
+SCRAPER_DRIVERS = int(os.getenv('SCRAPER_DRIVERS', 3))
+NAVEGADOR_HEADLESS = os.getenv('NAVEGADOR_HEADLESS', '1') == '1'
+USER_AGENT = os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+# TTL em segundos por fonte do cache local (None = não expira)
+CACHE_TTL = {
+    "investidor10": 24 * 3600,
+    "etfsbrasil": 24 * 3600,
+    "yahoo": 6 * 3600,
+    "bcb": 6 * 3600,
+    "llm": None,
+    "embeddings": None,
+    "resumos": None,
+    # A chave inclui o hash dos retornos, então uma entrada nunca fica desatualizada
+    "covariancia": None,
+}
+CACHE_TAMANHO_MAXIMO = int(os.getenv('CACHE_TAMANHO_MAXIMO_MB', 512)) * 1024 ** 2
+CACHE_OFFLINE = os.getenv('CACHE_OFFLINE', '0') == '1'
+# Data (AAAA-MM-DD) usada como "hoje" na coleta de preços, para repetir offline uma coleta já em cache
+CACHE_DATA_REFERENCIA = os.getenv('CACHE_DATA_REFERENCIA')
+
+PESO_MAXIMO_ATIVO = float(os.getenv('PESO_MAXIMO_ATIVO', 0.10))
+PESO_MAXIMO_SEGMENTO = float(os.getenv('PESO_MAXIMO_SEGMENTO', 0.35))
+TAXA_LIVRE_RISCO = float(os.getenv('TAXA_LIVRE_RISCO', 0.0))
+
+# amostral, ledoit_wolf, ewma ou fatorial
+COVARIANCIA_METODO = os.getenv('COVARIANCIA_METODO', 'ledoit_wolf')
+EWMA_LAMBDA = float(os.getenv('EWMA_LAMBDA', 0.94))
+
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', os.cpu_count() or 1))
+BACKTEST_FREQUENCIAS = ["ME", "QE"]
+BACKTEST_JANELAS = [12, 24]
+BACKTEST_CUSTOS = [0.0, 0.001, 0.005]
+
+# cholesky ou bootstrap
+CENARIOS_METODO = os.getenv('CENARIOS_METODO', 'cholesky')
+CENARIOS_SIMULACOES = int(os.getenv('CENARIOS_SIMULACOES', 50000))
+CENARIOS_LOTE = int(os.getenv('CENARIOS_LOTE', 5000))
+CENARIOS_SEMENTE = int(os.getenv('CENARIOS_SEMENTE', 42))
+CENARIOS_NIVEL = float(os.getenv('CENARIOS_NIVEL', 0.95))
+CENARIOS_WORKERS = int(os.getenv('CENARIOS_WORKERS', os.cpu_count() or 1))
+
+OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODELO = os.getenv('OLLAMA_MODELO', 'llama3.2:latest')
+OLLAMA_MODELO_EMBEDDING = os.getenv('OLLAMA_MODELO_EMBEDDING', 'nomic-embed-text')
+OLLAMA_TIMEOUT = float(os.getenv('OLLAMA_TIMEOUT', 300))
+OLLAMA_CONCORRENCIA = int(os.getenv('OLLAMA_CONCORRENCIA', 2))
+OLLAMA_TENTATIVAS = int(os.getenv('OLLAMA_TENTATIVAS', 3))
+OLLAMA_BACKOFF = float(os.getenv('OLLAMA_BACKOFF', 2))
+# Tamanho de cada bloco enviado ao modelo nos resumos (o contexto padrão do Ollama é 2048)
+RESUMO_TOKENS_BLOCO = int(os.getenv('RESUMO_TOKENS_BLOCO', 1500))
+
+SEGMENTOS_TOP_K = int(os.getenv('SEGMENTOS_TOP_K', 25))
+
+VIDEO_DOWNLOADS = int(os.getenv('VIDEO_DOWNLOADS', 2))
+
+# tiny, base, small, medium ou large
+WHISPER_MODELO = os.getenv('WHISPER_MODELO', 'base')
+WHISPER_WORKERS = int(os.getenv('WHISPER_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
+WHISPER_THREADS = int(os.getenv('WHISPER_THREADS', max(1, (os.cpu_count() or 1) // WHISPER_WORKERS)))
+WHISPER_SEGMENTO_S = float(os.getenv('WHISPER_SEGMENTO_S', 300))
+
+# Quanto a energia de um quadro precisa superar o ruído de fundo para contar como voz
+VAD_MARGEM_DB = float(os.getenv('VAD_MARGEM_DB', 10))
+# Fração mínima de quadros com energia baixa em uma janela de ~1,5 s para contar como fala (abaixo disso é música)
+VAD_VARIACAO_MINIMA = float(os.getenv('VAD_VARIACAO_MINIMA', 0.15))
+
+DASHBOARD_JANELA_DIAS = int(os.getenv('DASHBOARD_JANELA_DIAS', 730))
+# Pontos por série nos gráficos de linha do dashboard (aprox. a largura em pixels)
+DASHBOARD_PONTOS_SERIE = int(os.getenv('DASHBOARD_PONTOS_SERIE', 600))
@@ -1,10 +1,17 @@
 import streamlit as st
 import pandas as pd
 import json
+import logging
+import os
+import time
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from classes.PostgreSQL import PostgresSQL
+from classes.ArmazemPrecos import ArmazemPrecos
 from pypika import Table, Query
+from config import DASHBOARD_JANELA_DIAS, DASHBOARD_PONTOS_SERIE
 
 # === Leitura do Secret do Streamlit ===
 DB_CONNECTION_STRING = st.secrets["DB_CONNECTION_STRING"]
@@ -36,8 +43,39 @@ def load_json_data(filepath="carteiras_otimizadas.json"):
         return None
 
 
+@st.cache_data(ttl=600)
+def load_frontier_data(filepath="fronteira_eficiente.parquet"):
+    try:
+        return pd.read_parquet(filepath)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        st.warning(f"Erro ao ler a fronteira eficiente: {e}")
+        return None
+
+
+@st.cache_data(ttl=600)
+def load_dashboard_bundle(diretorio="dados_dashboard"):
+    # Pacote pré-calculado por Carteira.calcular_carteiras; sem ele o
+    # dashboard consulta o banco
+    arquivos = ['ativos', 'precos', 'backtest', 'mensal']
+    caminhos = {nome: os.path.join(diretorio, f"{nome}.parquet") for nome in arquivos}
+
+    if not all(os.path.exists(c) for c in caminhos.values()):
+        return None
+
+    try:
+        return {nome: pd.read_parquet(caminho) for nome, caminho in caminhos.items()}
+    except Exception as e:
+        st.warning(f"Erro ao ler o pacote do dashboard: {e}")
+        return None
+
+
 @st.cache_data(ttl=3600)
-def get_data_for_dashboard(_db_conn, tickers_carteira: list):
+def get_data_for_dashboard(_db_conn, tickers_carteira: tuple):
+    # Chamada uma única vez com a união dos ativos de todos os perfis
+    # (ordenada), então mudanças de peso não invalidam o cache
+    tickers_carteira = list(tickers_carteira)
     if not tickers_carteira:
         return pd.DataFrame(columns=['TICKER', 'SEGMENTO', 'CATEGORIA']), pd.DataFrame()
     
@@ -68,7 +106,13 @@ def get_data_for_dashboard(_db_conn, tickers_carteira: list):
     else:
         df_info_ativos['SEGMENTO'] = 'Não Classificado'
 
-    data_limite = datetime.now() - timedelta(days=95)
+    data_limite = datetime.now() - timedelta(days=DASHBOARD_JANELA_DIAS)
+
+    # Matriz local de preços (memory-map), quando existir no servidor
+    df_precos_local = ArmazemPrecos().selecionar(tickers_carteira, desde=data_limite)
+    if df_precos_local is not None and not df_precos_local.empty:
+        return df_info_ativos, df_precos_local.ffill().dropna(axis=1, how='all')
+
     precos_table = Table("PRECOS")
     
     q_precos = (
@@ -82,7 +126,7 @@ def get_data_for_dashboard(_db_conn, tickers_carteira: list):
     try:
         df_precos = _db_conn.query(q_precos.get_sql())
         if df_precos.empty:
-            st.warning("Nenhum dado de preço encontrado nos últimos 3 meses.")
+            st.warning("Nenhum dado de preço encontrado no período do dashboard.")
             return df_info_ativos, pd.DataFrame()
                 
         df_precos_pivot = df_precos.pivot(
@@ -122,6 +166,108 @@ def create_backtest_df(precos_pivot: pd.DataFrame, pesos: dict):
     return df_final
 
 
+def load_shared_data(bundle: dict, db_conn, data: dict):
+    # Metadados e preços de todos os perfis, carregados uma vez por
+    # execução; cada aba só seleciona as suas colunas
+    inicio = time.perf_counter()
+    tickers = tuple(sorted({t for carteira in data.values() for t in carteira.get("pesos", {})}))
+
+    if bundle is not None:
+        df_info_ativos, df_precos = bundle['ativos'], bundle['precos'].astype(float)
+    else:
+        df_info_ativos, df_precos = get_data_for_dashboard(db_conn, tickers)
+
+    logging.info(
+        f"Dados do dashboard ({'pacote' if bundle is not None else 'banco'}): "
+        f"{len(tickers)} ativos, {df_precos.shape} preços em {time.perf_counter() - inicio:.3f}s"
+    )
+    return df_info_ativos, df_precos
+
+
+def select_portfolio_data(df_info_total: pd.DataFrame, df_precos_total: pd.DataFrame, tickers_carteira: list):
+    df_info_ativos = df_info_total[df_info_total['TICKER'].isin(tickers_carteira)]
+    df_precos = df_precos_total[[t for t in tickers_carteira if t in df_precos_total.columns]]
+    return df_info_ativos, df_precos.dropna(how='all')
+
+
+def get_backtest_df(bundle: dict, perfil_nome: str, precos_pivot: pd.DataFrame, pesos: dict, inicio=None):
+    if bundle is not None and perfil_nome in bundle['backtest'].columns:
+        serie = bundle['backtest'][perfil_nome].dropna()
+        if inicio is not None:
+            serie = serie[serie.index >= inicio]
+        if serie.empty:
+            return pd.DataFrame()
+        return pd.DataFrame({'Carteira (Base 100)': serie / serie.iloc[0] * 100})
+    return create_backtest_df(precos_pivot, pesos)
+
+
+def get_monthly_return(bundle: dict, perfil_nome: str, df_backtest: pd.DataFrame, inicio=None):
+    if bundle is not None and perfil_nome in bundle['mensal'].columns:
+        mensal = bundle['mensal'][perfil_nome].dropna()
+        if inicio is not None:
+            # Só os meses cujo retorno começa dentro do período
+            mensal = mensal[mensal.index - pd.offsets.MonthEnd(1) >= inicio]
+        return mensal
+
+    df_mensal = df_backtest['Carteira (Base 100)'].resample('ME').last()
+    return df_mensal.pct_change().dropna() * 100
+
+
+def downsample_minmax(x: np.ndarray, y: np.ndarray, n_buckets: int):
+    # Mantém o mínimo e o máximo de cada balde, preservando picos e vales
+    # (e sempre o primeiro e o último ponto da série)
+    limites = np.linspace(0, len(y), n_buckets + 1).astype(int)
+    indices = {0, len(y) - 1}
+    for a, b in zip(limites[:-1], limites[1:]):
+        if b > a:
+            trecho = y[a:b]
+            indices.update((a + int(np.argmin(trecho)), a + int(np.argmax(trecho))))
+    indices = np.asarray(sorted(indices))
+    return x[indices], y[indices]
+
+
+def downsample_lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    # Largest-Triangle-Three-Buckets: em cada balde escolhe o ponto que forma
+    # o maior triângulo com o ponto escolhido antes e a média do balde seguinte
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    xs = x.astype('datetime64[ns]').astype(np.int64).astype(float) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+    limites = np.linspace(1, n - 1, n_out - 1).astype(int)
+    escolhidos = [0]
+
+    for i in range(n_out - 2):
+        a, b = limites[i], limites[i + 1]
+        c = limites[i + 2] if i + 2 < len(limites) else n
+        media_x, media_y = xs[b:c].mean(), y[b:c].mean()
+        anterior = escolhidos[-1]
+
+        areas = np.abs(
+            (xs[anterior] - media_x) * (y[a:b] - y[anterior])
+            - (xs[anterior] - xs[a:b]) * (media_y - y[anterior])
+        )
+        escolhidos.append(a + int(np.argmax(areas)))
+
+    escolhidos.append(n - 1)
+    escolhidos = np.asarray(escolhidos)
+    return x[escolhidos], y[escolhidos]
+
+
+def downsample_series(serie: pd.Series, n_pontos: int = DASHBOARD_PONTOS_SERIE):
+    """Reduz uma série ao orçamento de pontos do gráfico: séries muito
+    longas passam antes por min-max (barato) e depois por LTTB."""
+    serie = serie.dropna()
+    x, y = serie.index.values, serie.to_numpy(dtype=float)
+
+    if len(y) <= n_pontos:
+        return x, y
+
+    if len(y) > 8 * n_pontos:
+        x, y = downsample_minmax(x, y, 2 * n_pontos)
+    return downsample_lttb(x, y, n_pontos)
+
+
 def create_individual_return_df(precos_pivot: pd.DataFrame, pesos: dict):
     portfolio_cols_existentes = [col for col in pesos.keys() if col in precos_pivot.columns]
     precos_carteira = precos_pivot[portfolio_cols_existentes]
@@ -134,18 +280,76 @@ def create_individual_return_df(precos_pivot: pd.DataFrame, pesos: dict):
 
 
 # --- Construção do Dashboard ---
+PERIODOS = {"1 mês": 31, "3 meses": 95, "6 meses": 183, "1 ano": 366, "Tudo": None}
+
 st.title("📈 Dashboard de Otimização de Carteiras")
 
-db_conn = get_db_connection()
 data = load_json_data()
+bundle = load_dashboard_bundle()
+db_conn = get_db_connection() if bundle is None else None
 
-if db_conn is None or data is None:
+if data is None or (bundle is None and db_conn is None):
     st.stop()
 
-perfil_conservador, perfil_moderado, perfil_arrojado = st.tabs(
-    ["Conservador", "Moderado", "Arrojado"]
+df_info_total, df_precos_total = load_shared_data(bundle, db_conn, data)
+
+perfil_conservador, perfil_moderado, perfil_arrojado, aba_fronteira = st.tabs(
+    ["Conservador", "Moderado", "Arrojado", "Fronteira Eficiente"]
 )
 
+with aba_fronteira:
+    df_fronteira = load_frontier_data()
+
+    if df_fronteira is None or df_fronteira.empty:
+        st.info("Fronteira eficiente não encontrada. Execute o cálculo das carteiras primeiro.")
+    else:
+        colunas_metricas = ['retorno', 'volatilidade', 'sharpe']
+
+        vol_min = float(df_fronteira['volatilidade'].min())
+        vol_max = float(df_fronteira['volatilidade'].max())
+        vol_escolhida = st.slider(
+            'Nível de risco (volatilidade anual)',
+            min_value=vol_min,
+            max_value=vol_max,
+            value=vol_min,
+            format="%.4f",
+            key="fronteira_risco"
+        )
+
+        ponto = df_fronteira.iloc[(df_fronteira['volatilidade'] - vol_escolhida).abs().argmin()]
+
+        fig_fronteira = px.line(
+            df_fronteira,
+            x='volatilidade',
+            y='retorno',
+            markers=True,
+            hover_data={'sharpe': ':.2f'},
+            title='Fronteira Eficiente',
+            labels={'volatilidade': 'Volatilidade anual', 'retorno': 'Retorno esperado'}
+        )
+        fig_fronteira.add_scatter(
+            x=[ponto['volatilidade']], y=[ponto['retorno']],
+            mode='markers', marker=dict(size=14, color='red'), name='Selecionado'
+        )
+
+        col_curva, col_pesos = st.columns(2)
+
+        with col_curva:
+            st.plotly_chart(fig_fronteira, use_container_width=True, key="fronteira_curva")
+            met1, met2, met3 = st.columns(3)
+            met1.metric("Retorno esperado", f"{ponto['retorno'] * 100:.2f}%")
+            met2.metric("Volatilidade", f"{ponto['volatilidade'] * 100:.2f}%")
+            met3.metric("Sharpe", f"{ponto['sharpe']:.2f}")
+
+        with col_pesos:
+            pesos_ponto = ponto.drop(colunas_metricas).astype(float)
+            pesos_ponto = pesos_ponto[pesos_ponto > 0].sort_values(ascending=False)
+            df_pesos_ponto = pd.DataFrame({'Ativo': pesos_ponto.index, 'Peso': pesos_ponto.values})
+
+            fig_pesos = px.bar(df_pesos_ponto, x='Ativo', y='Peso', title='Composição do Ponto Selecionado')
+            fig_pesos.update_layout(yaxis_tickformat=".1%")
+            st.plotly_chart(fig_pesos, use_container_width=True, key="fronteira_pesos")
+
 for perfil_nome, aba in [
     ("conservador", perfil_conservador),
     ("moderado", perfil_moderado),
@@ -165,7 +369,7 @@ for perfil_nome, aba in [
 
     tickers_carteira = list(pesos_dict.keys())
     
-    df_info_ativos, df_precos = get_data_for_dashboard(db_conn, tickers_carteira)
+    df_info_ativos, df_precos = select_portfolio_data(df_info_total, df_precos_total, tickers_carteira)
 
     with aba:
         df_pesos = pd.DataFrame(pesos_dict.items(), columns=['Ativo', 'Peso'])
@@ -268,10 +472,22 @@ for perfil_nome, aba in [
         st.divider()
 
         if not df_precos.empty:
-            df_backtest = create_backtest_df(df_precos, pesos_dict)
+            nome_periodo = st.radio(
+                'Período',
+                options=list(PERIODOS.keys()),
+                index=list(PERIODOS.keys()).index("3 meses"),
+                horizontal=True,
+                key=f"periodo_{perfil_nome}"
+            )
+            dias_periodo = PERIODOS[nome_periodo]
+            inicio_periodo = None if dias_periodo is None else df_precos.index.max() - pd.Timedelta(days=dias_periodo)
+            if inicio_periodo is not None:
+                df_precos = df_precos[df_precos.index >= inicio_periodo]
+
+            df_backtest = get_backtest_df(bundle, perfil_nome, df_precos, pesos_dict, inicio_periodo)
             
             if not df_backtest.empty:
-                st.subheader("Rendimento Total no Período (3 Meses)")
+                st.subheader(f"Rendimento Total no Período ({nome_periodo})")
                 retorno_total_3m = (df_backtest['Carteira (Base 100)'].iloc[-1] / df_backtest['Carteira (Base 100)'].iloc[0]) - 1
                 
                 st.metric(
@@ -283,8 +499,7 @@ for perfil_nome, aba in [
 
                 st.subheader("Rendimento Mensal (%)")
                 try:
-                    df_mensal = df_backtest['Carteira (Base 100)'].resample('ME').last()
-                    df_retorno_mensal = df_mensal.pct_change().dropna() * 100
+                    df_retorno_mensal = get_monthly_return(bundle, perfil_nome, df_backtest, inicio_periodo)
                     if not df_retorno_mensal.empty:
                         df_retorno_mensal.name = 'Rendimento Mensal (%)'
                         df_retorno_mensal.index = df_retorno_mensal.index.strftime('%Y-%m')
@@ -316,19 +531,19 @@ for perfil_nome, aba in [
                     if selected_tickers:
                         df_individual_filtered = df_individual_raw[selected_tickers]
                         
-                        df_plot = df_individual_filtered.reset_index().melt(
-                            id_vars=df_individual_filtered.index.name,
-                            var_name='Ativo',
-                            value_name='Rendimento (%)'
-                        )
+                        # Cada série é reduzida ao orçamento de pontos do gráfico, o
+                        # que basta para o SVG; o Scattergl não é desenhado no
+                        # rangeslider
+                        fig_individual = go.Figure()
+                        for ticker in selected_tickers:
+                            x, y = downsample_series(df_individual_filtered[ticker])
+                            fig_individual.add_trace(go.Scatter(x=x, y=y, mode='lines', name=ticker))
 
-                        fig_individual = px.line(
-                            df_plot,
-                            x=df_individual_filtered.index.name,
-                            y='Rendimento (%)',
-                            color='Ativo',
+                        fig_individual.update_layout(
                             title=f"Rendimento Individual dos Ativos ({perfil_nome.capitalize()})",
-                            labels={'DATA': 'Data', 'Rendimento (%)': 'Rendimento (%)'}
+                            xaxis_title='Data',
+                            yaxis_title='Rendimento (%)',
+                            legend_title_text='Ativo'
                         )
                         
                         fig_individual.update_layout(
@@ -339,6 +554,8 @@ for perfil_nome, aba in [
                                     buttons=list([
                                         dict(count=1, label="1m", step="month", stepmode="backward"),
                                         dict(count=3, label="3m", step="month", stepmode="backward"),
+                                        dict(count=6, label="6m", step="month", stepmode="backward"),
+                                        dict(count=1, label="1a", step="year", stepmode="backward"),
                                         dict(step="all")
                                     ])
                                 ),
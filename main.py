@@ -1,13 +1,22 @@
+
 from classes.ColetorDados import ColetorDados
 from classes.Resumo import Resumo
+from classes.IngestaoVideos import IngestaoVideos
 from classes.Carteira import Carteira
 
 
-#coletor = ColetorDados()
-#coletor.coletar_precos()
+if __name__ == "__main__":
+    #coletor = ColetorDados()
+    #coletor.backfill_precos()
+    #coletor.coletar_precos()
+
+    #with IngestaoVideos() as ingestao:
+    #    ingestao.executar(["https://www.youtube.com/playlist?list=..."])
 
-#resumo = Resumo()
-#resumo.resumir_diretorio()
+    #with Resumo() as resumo:
+    #    resumo.resumir_diretorio()
 
-carteira = Carteira()
-carteira.calcular_carteiras()
+    carteira = Carteira()
+    carteira.calcular_carteiras()
+    carteira.calcular_fronteira()
+    #carteira.calcular_backtest()
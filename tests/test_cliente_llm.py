@@ -0,0 +1,207 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from classes.CacheDisco import CacheDisco
+from classes.ClienteLLM import ClienteLLM, ErroLLM
+
+
+class OllamaFalso(ThreadingHTTPServer):
+    """Servidor local que imita /api/generate (em streaming) e /api/embed.
+
+    O comportamento de cada prompt é definido pelo teste:
+    - `falhas[prompt]`: quantas chamadas respondem 500 antes de funcionar;
+    - `atrasos[prompt]`: lista de esperas (s) antes de responder, uma por chamada;
+    - `demora`: espera aplicada a todas as chamadas.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ManipuladorOllama)
+        self.lock = threading.Lock()
+        self.chamadas = []
+        self.falhas = {}
+        self.atrasos = {}
+        self.demora = 0.0
+        self.simultaneas = 0
+        self.maximo_simultaneas = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ManipuladorOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        ...
+
+    def __responder(self, status: int, corpo: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        servidor = self.server
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        chave = corpo.get("prompt", json.dumps(corpo.get("input")))
+
+        with servidor.lock:
+            servidor.chamadas.append((self.path, chave, time.perf_counter()))
+            servidor.simultaneas += 1
+            servidor.maximo_simultaneas = max(servidor.maximo_simultaneas, servidor.simultaneas)
+            falhar = servidor.falhas.get(chave, 0) > 0
+            if falhar:
+                servidor.falhas[chave] -= 1
+            atrasos = servidor.atrasos.get(chave)
+            atraso = atrasos.pop(0) if atrasos else 0.0
+
+        try:
+            time.sleep(servidor.demora + atraso)
+
+            if falhar:
+                self.__responder(500, b'{"error": "sobrecarregado"}')
+            elif self.path == "/api/embed":
+                vetores = [[float(len(t)), 1.0, 0.0] for t in corpo["input"]]
+                self.__responder(200, json.dumps({"model": corpo["model"], "embeddings": vetores}).encode())
+            else:
+                self.__transmitir(corpo["prompt"])
+        finally:
+            with servidor.lock:
+                servidor.simultaneas -= 1
+
+    def __transmitir(self, prompt: str):
+        # Uma linha JSON por pedaço, como o Ollama com "stream": true
+        pedacos = [{"response": p, "done": False} for p in ["eco: ", prompt[:10], prompt[10:]]]
+        pedacos.append({"response": "", "done": True, "model": "falso",
+                        "prompt_eval_count": len(prompt), "eval_count": 3})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for pedaco in pedacos:
+            linha = json.dumps(pedaco).encode() + b"\n"
+            self.wfile.write(f"{len(linha):x}\r\n".encode() + linha + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class TestClienteLLM(unittest.TestCase):
+
+    def setUp(self):
+        self.servidor = OllamaFalso()
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.diretorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def cliente(self, **kwargs) -> ClienteLLM:
+        parametros = {"url": self.servidor.url, "modelo": "falso", "timeout": 5, "backoff": 0.0,
+                      "usar_cache": False, "modelo_embedding": "falso-embed"}
+        parametros.update(kwargs)
+        return ClienteLLM(**parametros)
+
+    def cache(self) -> CacheDisco:
+        return CacheDisco(self.diretorio, ttls={}, tamanho_maximo=None, offline=False)
+
+    def test_streaming_junta_os_pedacos_e_registra_metricas(self):
+        cliente = self.cliente()
+
+        resposta = cliente.gerar("um prompt com mais de dez letras")
+
+        self.assertEqual(resposta, "eco: um prompt com mais de dez letras")
+        self.assertEqual(len(cliente.metricas), 1)
+        self.assertEqual(cliente.metricas[0]["tokens_resposta"], 3)
+        self.assertEqual(cliente.metricas[0]["tokens_prompt"], len("um prompt com mais de dez letras"))
+
+    def test_limite_de_concorrencia(self):
+        self.servidor.demora = 0.1
+        cliente = self.cliente(concorrencia=2)
+
+        respostas = cliente.gerar_lote([f"prompt {i}" for i in range(8)])
+
+        self.assertEqual(respostas, [f"eco: prompt {i}" for i in range(8)])
+        self.assertEqual(self.servidor.maximo_simultaneas, 2)
+
+    def test_nova_tentativa_apos_erro_5xx(self):
+        self.servidor.falhas["instável"] = 2
+        cliente = self.cliente(tentativas=3)
+
+        self.assertEqual(cliente.gerar("instável"), "eco: instável")
+        self.assertEqual(len(self.servidor.chamadas), 3)
+
+    def test_erro_5xx_em_todas_as_tentativas(self):
+        self.servidor.falhas["fora do ar"] = 5
+        cliente = self.cliente(tentativas=2)
+
+        with self.assertRaises(ErroLLM):
+            cliente.gerar("fora do ar")
+        self.assertEqual(len(self.servidor.chamadas), 2)
+        self.assertEqual(cliente.gerar_lote(["fora do ar"]), [None])
+
+    def test_nova_tentativa_apos_timeout(self):
+        self.servidor.atrasos["lento"] = [1.0]
+        cliente = self.cliente(timeout=0.3, tentativas=2)
+
+        self.assertEqual(cliente.gerar("lento"), "eco: lento")
+        self.assertEqual(len(self.servidor.chamadas), 2)
+
+    def test_vaga_liberada_durante_o_backoff(self):
+        # Com uma única vaga, a espera do backoff de uma chamada que falhou
+        # não pode segurar as outras
+        self.servidor.falhas["falha"] = 1
+        cliente = self.cliente(concorrencia=1, tentativas=2, backoff=0.5)
+        concluidas = {}
+
+        def gerar(prompt):
+            cliente.gerar(prompt)
+            concluidas[prompt] = time.perf_counter()
+
+        primeira = threading.Thread(target=gerar, args=("falha",))
+        primeira.start()
+        while not self.servidor.chamadas:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        gerar("ok")
+        primeira.join()
+
+        self.assertLess(concluidas["ok"], concluidas["falha"])
+        inicio = self.servidor.chamadas[0][2]
+        self.assertLess(concluidas["ok"] - inicio, 0.45)
+
+    def test_cache_de_respostas(self):
+        cliente = self.cliente(usar_cache=True, cache=self.cache())
+
+        primeira = cliente.gerar("pergunta", system="sistema")
+        segunda = cliente.gerar("pergunta", system="sistema")
+        outro_system = cliente.gerar("pergunta", system="outro")
+
+        self.assertEqual(primeira, segunda)
+        self.assertEqual(outro_system, "eco: pergunta")
+        self.assertEqual(len(self.servidor.chamadas), 2)
+
+    def test_cache_de_embeddings_envia_so_textos_novos(self):
+        cliente = self.cliente(usar_cache=True, cache=self.cache())
+
+        primeiros = cliente.embeddings(["a", "bb"])
+        todos = cliente.embeddings(["bb", "ccc", "a"])
+
+        np.testing.assert_array_equal(primeiros, [[1, 1, 0], [2, 1, 0]])
+        np.testing.assert_array_equal(todos, [[2, 1, 0], [3, 1, 0], [1, 1, 0]])
+        self.assertEqual([c[1] for c in self.servidor.chamadas], ['["a", "bb"]', '["ccc"]'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from classes.ArmazemPrecos import ArmazemPrecos
+from classes.CacheDisco import CacheDisco
+from classes.ColetorDados import ColetorDados
+
+
+class BancoMemoria:
+    """Substitui o PostgresSQL com tabelas em DataFrames. Só entende a
+    consulta de histórico por ticker (MIN/MAX de DATA em PRECOS)."""
+
+    def __init__(self, tickers: list, precos: pd.DataFrame = None):
+        self.tabelas = {
+            "ATIVOS": pd.DataFrame({"TICKER": tickers}),
+            "PRECOS": precos if precos is not None else pd.DataFrame(columns=["DATA", "TICKER", "PRECO"]),
+        }
+        self.sincronizacoes = []
+
+    def read(self, tabela: str) -> pd.DataFrame:
+        return self.tabelas[tabela].copy()
+
+    def query(self, query: str) -> pd.DataFrame:
+        assert 'FROM "PRECOS"' in query and "MIN" in query and "MAX" in query, query
+        precos = self.tabelas["PRECOS"]
+        return precos.groupby("TICKER")["DATA"].agg(PRIMEIRA="min", ULTIMA="max").reset_index()
+
+    def sincronizar(self, tabela: str, df: pd.DataFrame, pk_cols: list):
+        self.sincronizacoes.append((tabela, len(df)))
+        partes = [t for t in (self.tabelas[tabela], df[["DATA", "TICKER", "PRECO"]]) if not t.empty]
+        combinado = pd.concat(partes, ignore_index=True)
+        self.tabelas[tabela] = combinado.drop_duplicates(subset=pk_cols, keep="last").reset_index(drop=True)
+
+
+class YahooFalso:
+    """Fonte de preços mensais no formato do yf.download(group_by="ticker").
+
+    `falhas[ticker]` é quantas chamadas o ticker volta sem dados antes de
+    funcionar; cada chamada fica registrada em `chamadas`."""
+
+    def __init__(self, falhas: dict = None):
+        self.falhas = dict(falhas or {})
+        self.chamadas = []
+
+    def __call__(self, tickers_yahoo: list, inicio, fim) -> pd.DataFrame:
+        self.chamadas.append((list(tickers_yahoo), pd.Timestamp(inicio)))
+        datas = pd.date_range(pd.Timestamp(inicio), pd.Timestamp(fim), freq="MS", name="Date")
+
+        colunas = {}
+        for i, ticker in enumerate(tickers_yahoo):
+            if self.falhas.get(ticker, 0) > 0:
+                self.falhas[ticker] -= 1
+                colunas[(ticker, "Close")] = [float("nan")] * len(datas)
+            else:
+                colunas[(ticker, "Close")] = [10.0 + i + j for j in range(len(datas))]
+
+        return pd.DataFrame(colunas, index=datas)
+
+
+def bcb_falso(url: str) -> list:
+    return [{"data": "02/01/2025", "valor": "0.05"}, {"data": "03/01/2025", "valor": "0.05"}]
+
+
+def pool_indisponivel(*args, **kwargs):
+    raise AssertionError("a coleta de preços não deve abrir navegadores")
+
+
+class TestColetarPrecos(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        patcher = mock.patch("classes.ColetorDados.YAHOO_BACKOFF", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def coletor(self, banco: BancoMemoria, yahoo: YahooFalso) -> ColetorDados:
+        cache = CacheDisco(self.diretorio + "/cache", ttls={}, tamanho_maximo=None, offline=False)
+        armazem = ArmazemPrecos(self.diretorio + "/precos")
+        return ColetorDados(baixar_precos=yahoo, baixar_serie=bcb_falso, postgre=banco, cache=cache,
+                            armazem=armazem, pool_navegadores=pool_indisponivel)
+
+    def test_coleta_inicial_grava_precos_e_armazem(self):
+        banco = BancoMemoria(["PETR4", "VALE3"])
+        yahoo = YahooFalso()
+
+        self.coletor(banco, yahoo).coletar_precos()
+
+        precos = banco.tabelas["PRECOS"]
+        self.assertEqual(set(precos["TICKER"]), {"PETR4", "VALE3", "SELIC", "CDI", "IPCA"})
+        self.assertEqual(yahoo.chamadas[0][0], ["PETR4.SA", "VALE3.SA"])
+
+        # Tickers sem histórico recebem a janela longa do backfill
+        self.assertGreater(len(precos[precos["TICKER"] == "PETR4"]), 12)
+
+        armazem = ArmazemPrecos(self.diretorio + "/precos").carregar()
+        self.assertEqual(set(armazem.columns), {"PETR4", "VALE3", "SELIC", "CDI", "IPCA"})
+
+    def test_coleta_incremental_parte_da_ultima_data(self):
+        ultima = pd.Timestamp.today().normalize() - pd.DateOffset(months=2)
+        precos = pd.DataFrame({"DATA": [ultima.strftime("%Y-%m-%d")], "TICKER": ["PETR4"], "PRECO": [30.0]})
+        banco = BancoMemoria(["PETR4", "VALE3"], precos)
+        yahoo = YahooFalso()
+
+        self.coletor(banco, yahoo).coletar_precos()
+
+        inicios = {tickers[0]: inicio for tickers, inicio in yahoo.chamadas}
+        self.assertEqual(inicios["PETR4.SA"], ultima)
+        self.assertLess(inicios["VALE3.SA"], ultima - pd.DateOffset(years=1))
+
+    def test_falhas_repetidas_por_ticker_e_reportadas(self):
+        banco = BancoMemoria(["PETR4", "VALE3", "XPTO3"])
+        yahoo = YahooFalso(falhas={"VALE3.SA": 1, "XPTO3.SA": 99})
+
+        with self.assertLogs(level="WARNING") as logs:
+            self.coletor(banco, yahoo).coletar_precos()
+
+        # Só os tickers sem dados são pedidos de novo
+        self.assertEqual([t for t, _ in yahoo.chamadas],
+                         [["PETR4.SA", "VALE3.SA", "XPTO3.SA"], ["VALE3.SA", "XPTO3.SA"], ["XPTO3.SA"]])
+        self.assertEqual(set(banco.tabelas["PRECOS"]["TICKER"]) - {"SELIC", "CDI", "IPCA"}, {"PETR4", "VALE3"})
+        self.assertTrue(any("XPTO3" in linha for linha in logs.output))
+
+    def test_lote_completo_vem_do_cache(self):
+        banco = BancoMemoria(["PETR4"])
+        yahoo = YahooFalso()
+        self.coletor(banco, yahoo).coletar_precos(completo=True)
+
+        banco = BancoMemoria(["PETR4"])
+        self.coletor(banco, yahoo).coletar_precos(completo=True)
+
+        self.assertEqual(len(yahoo.chamadas), 1)
+        self.assertIn("PETR4", set(banco.tabelas["PRECOS"]["TICKER"]))
+
+
+if __name__ == "__main__":
+    unittest.main()